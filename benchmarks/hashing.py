@@ -0,0 +1,97 @@
+"""
+Throughput of the hash algorithms available for content-addressed filenames.
+
+Usage::
+
+    python benchmarks/hashing.py [--size MB] [--repeat N]
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+import typing as t
+
+from flask_uploader.utils import hash_stream, md5stream, new_hash
+
+
+ALGORITHMS = (
+    'md5',
+    'sha1',
+    'sha256',
+    'blake2b',
+    'blake2s',
+    'xxh64',
+    'xxh3_64',
+    'xxh3_128',
+    'blake3',
+)
+
+
+def available_algorithms() -> t.List[str]:
+    """Returns the names of the algorithms that can be used."""
+    names = []
+    for name in ALGORITHMS:
+        try:
+            new_hash(name)
+        except ValueError:
+            continue
+        names.append(name)
+    return names
+
+
+def measure(
+    func: t.Callable[[t.BinaryIO], str],
+    path: str,
+    repeat: int,
+) -> float:
+    """Returns the best time of the given number of runs in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        with open(path, 'rb') as f:
+            start = time.perf_counter()
+            func(t.cast(t.BinaryIO, f))
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=256, help='MB')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    size = args.size * 1024 * 1024
+    fd, path = tempfile.mkstemp()
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for _ in range(args.size):
+                f.write(os.urandom(1024 * 1024))
+
+        print(f'{"algorithm":<24}{"MB/s":>10}')
+
+        elapsed = measure(lambda f: md5stream(f), path, args.repeat)
+        print(f'{"md5 (16Kb read)":<24}{size / elapsed / 2 ** 20:>10.1f}')
+
+        if hasattr(hashlib, 'file_digest'):
+            elapsed = measure(
+                lambda f: hashlib.file_digest(f, 'md5').hexdigest(),
+                path,
+                args.repeat,
+            )
+            label = 'md5 (file_digest)'
+            print(f'{label:<24}{size / elapsed / 2 ** 20:>10.1f}')
+
+        for name in available_algorithms():
+            elapsed = measure(
+                lambda f: hash_stream(f, name), path, args.repeat
+            )
+            print(f'{name:<24}{size / elapsed / 2 ** 20:>10.1f}')
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Throughput of ``S3Storage.save`` depending on the number of parts
+uploaded in parallel.
+
+Runs against a local moto server by default, or any S3-compatible
+endpoint such as MinIO (the bucket must exist)::
+
+    python benchmarks/s3_upload.py [--size MB] [--concurrency 1 2 4 8]
+    python benchmarks/s3_upload.py --endpoint-url http://localhost:9000
+
+Requires ``pip install 'moto[server]'`` for the local server,
+with plain ``moto`` the requests are mocked in-process.
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+import typing as t
+
+import boto3
+from werkzeug.datastructures import FileStorage
+
+from flask_uploader.contrib.aws import S3Storage
+from flask_uploader.storages import TimestampStrategy
+
+
+BUCKET = 'flask-uploader-benchmark'
+
+
+@contextlib.contextmanager
+def local_s3() -> t.Iterator[t.Optional[str]]:
+    """
+    Starts a moto server in a thread and yields its URL,
+    or mocks S3 in-process and yields ``None``.
+    """
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+    try:
+        from moto.server import ThreadedMotoServer
+    except ImportError:
+        from moto import mock_aws
+
+        with mock_aws():
+            yield None
+        return
+
+    server = ThreadedMotoServer(port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+
+    try:
+        yield f'http://{host}:{port}'
+    finally:
+        server.stop()
+
+
+def measure(storage: S3Storage, path: str, repeat: int) -> float:
+    """Returns the best time of the given number of runs in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        with open(path, 'rb') as f:
+            start = time.perf_counter()
+            lookup = storage.save(FileStorage(f, filename='data.bin'))
+            best = min(best, time.perf_counter() - start)
+        storage.remove(lookup)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=256, help='MB')
+    parser.add_argument('--chunksize', type=int, default=8, help='MB')
+    parser.add_argument(
+        '--concurrency', type=int, nargs='+', default=[1, 2, 4, 8]
+    )
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--endpoint-url')
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        endpoint_url = args.endpoint_url
+
+        if endpoint_url is None:
+            endpoint_url = stack.enter_context(local_s3())
+
+        s3 = boto3.resource(
+            's3', endpoint_url=endpoint_url, region_name='us-east-1'
+        )
+
+        if args.endpoint_url is None:
+            s3.create_bucket(Bucket=BUCKET)
+
+        run(s3, args)
+
+
+def run(s3: t.Any, args: argparse.Namespace) -> None:
+    size = args.size * 1024 * 1024
+    fd, path = tempfile.mkstemp()
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for _ in range(args.size):
+                f.write(os.urandom(1024 * 1024))
+
+        print(f'{"concurrency":<24}{"MB/s":>10}')
+
+        storage = S3Storage(
+            s3,
+            BUCKET,
+            filename_strategy=TimestampStrategy(),
+            multipart_threshold=size + 1,
+        )
+        elapsed = measure(storage, path, args.repeat)
+        print(f'{"single PUT":<24}{size / elapsed / 2 ** 20:>10.1f}')
+
+        for concurrency in args.concurrency:
+            storage = S3Storage(
+                s3,
+                BUCKET,
+                filename_strategy=TimestampStrategy(),
+                multipart_threshold=S3Storage.MIN_PART_SIZE,
+                multipart_chunksize=args.chunksize * 1024 * 1024,
+                max_concurrency=concurrency,
+            )
+            elapsed = measure(storage, path, args.repeat)
+            print(f'{concurrency:<24}{size / elapsed / 2 ** 20:>10.1f}')
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
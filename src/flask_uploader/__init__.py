@@ -7,6 +7,7 @@ import typing as t
 
 from flask import Blueprint
 
+from .cli import cli
 from .core import Uploader
 from .views import DownloadView
 
@@ -28,6 +29,8 @@ def init_uploader(app: Flask) -> None:
     app.config.setdefault('UPLOADER_BLUEPRINT_URL_PREFIX', '/media')
     app.config.setdefault('UPLOADER_BLUEPRINT_SUBDOMAIN', None)
     app.config.setdefault('UPLOADER_DEFAULT_ENDPOINT', 'download')
+    app.config.setdefault('UPLOADER_RECEIVE_HASH_ALGORITHM', 'md5')
+    app.config.setdefault('UPLOADER_TEMP_DIR', None)
 
     @app.context_processor
     def processors() -> t.Dict[str, t.Any]:
@@ -46,3 +49,4 @@ def init_uploader(app: Flask) -> None:
         view_func=DownloadView.as_view(app.config['UPLOADER_DEFAULT_ENDPOINT'])
     )
     app.register_blueprint(bp)
+    app.cli.add_command(cli)
@@ -0,0 +1,64 @@
+from __future__ import annotations
+import typing as t
+
+import click
+from flask.cli import AppGroup
+
+from .core import Uploader
+from .storages import FileSystemStorage
+
+
+__all__ = ('cli',)
+
+
+cli = AppGroup('uploader', help='Manage uploaded files.')
+
+
+def get_storage(name: str) -> FileSystemStorage:
+    """Returns the file system storage of the uploader with the given name."""
+    try:
+        storage = Uploader.get_instance(name).storage
+    except RuntimeError as err:
+        raise click.ClickException(str(err)) from err
+
+    if not isinstance(storage, FileSystemStorage):
+        raise click.ClickException(
+            f'Uploader {name!r} does not use the file system storage.'
+        )
+
+    return storage
+
+
+@cli.command('make-dirs')
+@click.argument('name')
+def make_dirs_command(name: str) -> None:
+    """
+    Creates all directories for the hashed filenames of the uploader NAME.
+    """
+    storage = get_storage(name)
+
+    try:
+        count = storage.make_dirs()
+    except (TypeError, ValueError) as err:
+        raise click.ClickException(str(err)) from err
+
+    click.echo(f'Directories: {count}')
+
+
+@cli.command('reindex')
+@click.argument('name')
+@click.option(
+    '--algorithm',
+    default=None,
+    help='Calculate digests with the given hash algorithm.',
+)
+def reindex_command(name: str, algorithm: t.Optional[str]) -> None:
+    """Rebuilds the metadata index of the uploader NAME from disk."""
+    storage = get_storage(name)
+
+    try:
+        count = storage.reindex(algorithm)
+    except RuntimeError as err:
+        raise click.ClickException(str(err)) from err
+
+    click.echo(f'Files: {count}')
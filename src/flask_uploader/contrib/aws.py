@@ -1,27 +1,41 @@
 from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import wraps
 import inspect
 import io
 import itertools
 import os
+import threading
+import time
 import typing as t
 import urllib.parse
+import uuid
+import weakref
 
 from boto3.session import Session
 from boto3.resources.base import ServiceResource
-from botocore.client import BaseClient
-from botocore.exceptions import ClientError
-from flask import current_app, g
+from botocore.client import BaseClient, Config
+from botocore.exceptions import BotoCoreError, ClientError
+from flask import current_app, g, redirect
 from werkzeug.datastructures import FileStorage
 from werkzeug.local import LocalProxy
 
 from ..exceptions import (
     FileNotFound,
     PermissionDenied,
+    ValidationError,
 )
 from ..formats import guess_type
-from ..storages import AbstractStorage, File
-from ..utils import increment_path
+from ..inspection import get_upload_info
+from ..storages import (
+    AbstractStorage,
+    BatchResult,
+    File,
+    FileStat,
+    Page,
+    PresignedPost,
+)
+from ..utils import LRUCache, get_content_disposition, get_extension
 
 if t.TYPE_CHECKING:
     from botocore.session import Session as CoreSession
@@ -31,10 +45,11 @@ if t.TYPE_CHECKING:
         Bucket,
         S3ServiceResource,
     )
+    from werkzeug.wrappers import Response
     from ..typing import FilenameStrategyCallable
 
 
-__all__ = ('AWS', 'S3Storage')
+__all__ = ('AWS', 'S3ObjectReader', 'S3Storage')
 
 
 _F = t.TypeVar('_F', bound=t.Callable[..., t.Any])
@@ -69,8 +84,43 @@ def catch_client_error(
     return decorator
 
 
+def _freeze(value: t.Any) -> t.Hashable:
+    """Returns a hashable form of a service configuration value."""
+    if isinstance(value, Config):
+        value = {
+            name: getattr(value, name, None)
+            for name in Config.OPTION_DEFAULTS
+        }
+
+    if isinstance(value, dict):
+        return tuple(sorted(
+            (str(k), _freeze(v)) for k, v in value.items()
+        ))
+
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+
+    return t.cast(t.Hashable, value)
+
+
+def _make_service_key(
+    service_name: str,
+    user_config: t.Dict[str, t.Any],
+) -> t.Tuple[str, t.Hashable]:
+    """
+    Returns the key of a client in the pools,
+    clients of a service with different configurations are kept apart.
+    """
+    return service_name, _freeze(user_config)
+
+
 class AWS:
-    __slots__ = ('app', 'botocore_session')
+    __slots__ = ('app', 'botocore_session', '_lock', '_pools', '_sessions')
 
     def __init__(
         self,
@@ -80,12 +130,21 @@ class AWS:
     ) -> None:
         self.app = app
         self.botocore_session = botocore_session
+        self._lock = threading.RLock()
+        self._pools: weakref.WeakKeyDictionary[
+            Flask, t.Dict[t.Tuple[str, t.Hashable], ServiceResource]
+        ] = weakref.WeakKeyDictionary()
+        self._sessions: weakref.WeakKeyDictionary[Flask, Session] = (
+            weakref.WeakKeyDictionary()
+        )
 
         if app is not None:
             self.init_app(app)
 
     def get_app(self) -> Flask:
-        return self.app if self.app else current_app
+        if self.app:
+            return self.app
+        return current_app._get_current_object()  # type: ignore
 
     def init_app(self, app: Flask) -> None:
         app.config.setdefault('AWS_ACCESS_KEY_ID', None)
@@ -97,6 +156,8 @@ class AWS:
         app.config.setdefault('AWS_USE_SSL', True)
         app.config.setdefault('AWS_VERIFY', None)
         app.config.setdefault('AWS_ENDPOINT_URL', None)
+        app.config.setdefault('AWS_MAX_POOL_CONNECTIONS', None)
+        app.config.setdefault('AWS_PERSISTENT_CLIENTS', False)
         app.teardown_appcontext(self.teardown)
         # app.extensions['aws'] = self
 
@@ -105,32 +166,109 @@ class AWS:
         service_name: str,
         **user_config: t.Any,
     ) -> BaseClient:
-        clients: t.Dict[str, BaseClient] = g.setdefault('boto3_clients', {})
+        if self._is_persistent():
+            resource = self._get_shared_resource(service_name, user_config)
+            return resource.meta.client
 
-        if service_name not in clients:
-            clients[service_name] = self.session.client(
-                service_name,
-                **self._make_service_config(service_name, user_config)
-            )
+        key = _make_service_key(service_name, user_config)
+        clients: t.Dict[t.Tuple[str, t.Hashable], BaseClient] = (
+            g.setdefault('boto3_clients', {})
+        )
 
-        return clients[service_name]
+        with self._get_context_lock():
+            if key not in clients:
+                clients[key] = self.session.client(
+                    service_name,
+                    **self._make_service_config(service_name, user_config)
+                )
+
+        return clients[key]
 
     def _create_resource(
         self,
         service_name: str,
         **user_config: t.Any,
     ) -> ServiceResource:
-        resources: t.Dict[str, ServiceResource] = g.setdefault(
-            'boto3_resources', {}
+        key = _make_service_key(service_name, user_config)
+        # Resources are not thread-safe, so each thread of the application
+        # context gets its own lightweight resource over the shared client.
+        local: t.Dict[t.Tuple[str, t.Hashable], ServiceResource] = (
+            g.setdefault('boto3_local', threading.local())
+            .__dict__.setdefault('resources', {})
         )
 
-        if service_name not in resources:
-            resources[service_name] = self.session.resource(
-                service_name,
-                **self._make_service_config(service_name, user_config)
+        if key in local:
+            return local[key]
+
+        if self._is_persistent():
+            template = self._get_shared_resource(service_name, user_config)
+        else:
+            resources: t.Dict[t.Tuple[str, t.Hashable], ServiceResource] = (
+                g.setdefault('boto3_resources', {})
             )
 
-        return resources[service_name]
+            with self._get_context_lock():
+                if key not in resources:
+                    resources[key] = self.session.resource(
+                        service_name,
+                        **self._make_service_config(service_name, user_config)
+                    )
+
+            template = resources[key]
+
+        local[key] = type(template)(client=template.meta.client)
+        return local[key]
+
+    def _get_context_lock(self) -> threading.RLock:
+        """
+        Returns the lock of the current application context,
+        threads sharing the context, as in ``Uploader.save_many``,
+        create its session and clients once.
+        """
+        return t.cast(
+            threading.RLock, g.setdefault('boto3_lock', threading.RLock())
+        )
+
+    def _get_shared_resource(
+        self,
+        service_name: str,
+        user_config: t.Dict[str, t.Any],
+    ) -> ServiceResource:
+        """
+        Returns a resource created once per application and configuration,
+        whose thread-safe client is shared by all threads.
+        """
+        app = self.get_app()
+        key = _make_service_key(service_name, user_config)
+        pool = self._pools.get(app)
+
+        if pool is None or key not in pool:
+            with self._lock:
+                pool = self._pools.setdefault(app, {})
+
+                if key not in pool:
+                    pool[key] = self._get_shared_session().resource(
+                        service_name,
+                        **self._make_service_config(service_name, user_config)
+                    )
+
+        return pool[key]
+
+    def _get_shared_session(self) -> Session:
+        """Returns a session created once per application."""
+        app = self.get_app()
+
+        with self._lock:
+            session = self._sessions.get(app)
+
+            if session is None:
+                session = self._sessions[app] = self._create_session()
+
+        return session
+
+    def _is_persistent(self) -> bool:
+        """Returns true if clients are shared for the whole process."""
+        return bool(self.get_app().config['AWS_PERSISTENT_CLIENTS'])
 
     def _create_session(self) -> Session:
         config = self.get_app().config
@@ -166,6 +304,17 @@ class AWS:
             return config.get(key.upper(), default)
 
         config = self.get_app().config
+        max_pool_connections = get_param(
+            'max_pool_connections', config['AWS_MAX_POOL_CONNECTIONS']
+        )
+
+        if max_pool_connections is not None:
+            client_config = Config(max_pool_connections=max_pool_connections)
+
+            if user_config.get('config') is not None:
+                client_config = client_config.merge(user_config['config'])
+
+            user_config = {**user_config, 'config': client_config}
 
         return {
             'aws_access_key_id': get_param('aws_access_key_id'),
@@ -225,14 +374,36 @@ class AWS:
             lambda: self._create_resource(service_name, **user_config)
         ))
 
+    def close(self, app: t.Optional[Flask] = None) -> None:
+        """
+        Closes the shared clients of the application
+        created with the ``AWS_PERSISTENT_CLIENTS`` option.
+        New clients are created on the next access.
+        """
+        app = app or self.get_app()
+
+        with self._lock:
+            pool = self._pools.pop(app, {})
+            self._sessions.pop(app, None)
+
+        for resource in pool.values():
+            resource.meta.client.close()
+
     @property
     def session(self) -> Session:
         """
         Returns a session instance that stores configuration state
         and allows you to create service clients and resources.
+
+        With the ``AWS_PERSISTENT_CLIENTS`` option,
+        one session is shared by the whole process.
         """
-        if not hasattr(g, 'boto3_session'):
-            g.boto3_session = self._create_session()
+        if self._is_persistent():
+            return self._get_shared_session()
+
+        with self._get_context_lock():
+            if not hasattr(g, 'boto3_session'):
+                g.boto3_session = self._create_session()
         return t.cast(Session, g.boto3_session)
 
     def teardown(self, exception: t.Optional[BaseException] = None) -> None:
@@ -246,14 +417,135 @@ class AWS:
                 srv.close()
 
 
+class S3ObjectReader(io.RawIOBase):
+    """
+    A seekable read-only stream over the body of an object in S3 storage.
+
+    The body is read in chunks of the requested size as it arrives,
+    so memory usage does not depend on the object size.
+    After a seek, the body is requested again from the new position
+    with the ``Range`` header on the next read.
+    """
+
+    def __init__(
+        self,
+        client: S3Client,
+        bucket_name: str,
+        key: str,
+        response: t.Mapping[str, t.Any],
+    ) -> None:
+        """
+        Arguments:
+            client (S3Client):
+                A low level client for working with S3 object storage.
+            bucket_name (str):
+                The name of the bucket in S3 object storage.
+            key (str):
+                Resource ID in S3 object storage.
+            response (dict):
+                The response of the ``get_object`` method.
+        """
+        super().__init__()
+        self._client = client
+        self._bucket_name = bucket_name
+        self._key = key
+        self._etag = response['ETag']
+        self._size = response['ContentLength']
+        self._body: t.Optional[t.Any] = response['Body']
+        self._position = 0
+
+    def close(self) -> None:
+        if self._body is not None:
+            self._body.close()
+            self._body = None
+        super().close()
+
+    def readable(self) -> bool:
+        return True
+
+    @catch_client_error()
+    def readinto(self, buffer: t.Any) -> int:
+        if self._position >= self._size:
+            return 0
+
+        if self._body is None:
+            self._body = self._client.get_object(
+                Bucket=self._bucket_name,
+                Key=self._key,
+                Range=f'bytes={self._position}-',
+                IfMatch=self._etag,
+            )['Body']
+
+        data = self._body.read(len(buffer))
+        size = len(data)
+        buffer[:size] = data
+        self._position += size
+
+        return size
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self._size
+
+        if offset < 0:
+            raise ValueError(f'Negative seek position {offset}.')
+
+        if offset != self._position and self._body is not None:
+            self._body.close()
+            self._body = None
+
+        self._position = offset
+
+        return self._position
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+
 class S3Storage(AbstractStorage):
+    #: Error codes of a conditional write to an existing key.
+    CONFLICT_ERRORS = frozenset((
+        'ConditionalRequestConflict',
+        'PreconditionFailed',
+    ))
+    #: The user metadata that marks objects uploaded with a presigned POST.
+    PRESIGNED_POST_METADATA = ('presigned-post', '1')
+    #: Exception types of error codes, other errors are ``PermissionDenied``.
+    ERROR_TYPES: t.Dict[str, t.Type[Exception]] = {
+        'NoSuchBucket': FileNotFound,
+        'NoSuchKey': FileNotFound,
+    }
+    #: Error codes of services that do not support conditional writes.
+    UNSUPPORTED_ERRORS = frozenset(('NotImplemented',))
+    #: The minimum size of a part in multipart uploads, except the last one.
+    MIN_PART_SIZE = 5 * 1024 * 1024
+    #: The maximum number of parts in multipart uploads.
+    MAX_PARTS = 10000
+    #: The maximum size of an object.
+    MAX_OBJECT_SIZE = 5 * 1024 ** 4
+    #: The maximum number of keys in one ``DeleteObjects`` request.
+    MAX_DELETE_KEYS = 1000
+
     __slots__ = (
         '_bucket_name',
+        'conditional_writes',
         'is_public',
         'key_prefix',
+        '_last_indexes',
+        'max_concurrency',
+        'multipart_chunksize',
+        'multipart_threshold',
+        'offload_redirect',
         '_s3',
+        '_url_cache',
         '_url_pattern',
         'url_expires_in',
+        'url_refresh_fraction',
     )
 
     def __init__(
@@ -264,6 +556,13 @@ class S3Storage(AbstractStorage):
         is_public: bool = True,
         url_expires_in: int = 3600,
         filename_strategy: t.Optional[FilenameStrategyCallable] = None,
+        offload_redirect: bool = False,
+        url_cache_size: int = 1024,
+        url_refresh_fraction: float = 0.5,
+        multipart_threshold: int = 8 * 1024 * 1024,
+        multipart_chunksize: int = 8 * 1024 * 1024,
+        max_concurrency: int = 4,
+        conditional_writes: bool = True,
     ) -> None:
         """
         Arguments:
@@ -279,12 +578,64 @@ class S3Storage(AbstractStorage):
                 The number of seconds that signed URLs are valid.
             filename_strategy (FilenameStrategyCallable):
                 A callable that returns the name of the file to save.
+            offload_redirect (bool):
+                Download views redirect clients to the object URL
+                instead of proxying the content through the application.
+                Default to ``False``.
+            url_cache_size (int):
+                The maximum number of cached signed URLs,
+                ``0`` disables the cache. Default to ``1024``.
+            url_refresh_fraction (float):
+                The fraction of ``url_expires_in`` during which
+                a signed URL is reused, less than ``1``.
+                Default to ``0.5``.
+            multipart_threshold (int):
+                Files of this size or larger are uploaded in parts.
+                Default to 8Mb.
+            multipart_chunksize (int):
+                The size of each part, at least 5Mb.
+                Increased if the file does not fit into 10000 parts.
+                Default to 8Mb.
+            max_concurrency (int):
+                The number of parts uploaded in parallel.
+                At most ``max_concurrency + 1`` parts are held in memory.
+                Default to ``4``.
+            conditional_writes (bool):
+                Create objects with the ``If-None-Match: *`` header,
+                so a new file never overwrites an existing one
+                and needs no existence check.
+                Disabled automatically if the service does not support it.
+                Default to ``True``.
         """
+        if not 0 < url_refresh_fraction < 1:
+            raise ValueError(
+                'The url_refresh_fraction must be in the range (0, 1).'
+            )
+
+        if multipart_chunksize < self.MIN_PART_SIZE:
+            raise ValueError(
+                f'The multipart_chunksize must be at least '
+                f'{self.MIN_PART_SIZE} bytes.'
+            )
+
+        if max_concurrency < 1:
+            raise ValueError('The max_concurrency must be at least 1.')
+
         super().__init__(filename_strategy=filename_strategy)
         self._s3 = s3
         self._bucket_name = bucket_name
         self.is_public = is_public
         self.url_expires_in = url_expires_in
+        self.offload_redirect = offload_redirect
+        self.url_refresh_fraction = url_refresh_fraction
+        self.multipart_threshold = multipart_threshold
+        self.multipart_chunksize = multipart_chunksize
+        self.max_concurrency = max_concurrency
+        self.conditional_writes = conditional_writes
+        self._last_indexes: LRUCache[str, int] = LRUCache()
+        self._url_cache: LRUCache[str, t.Tuple[str, float]] = LRUCache(
+            url_cache_size
+        )
         self._url_pattern = ''
 
         if key_prefix is not None:
@@ -292,22 +643,56 @@ class S3Storage(AbstractStorage):
 
         self.key_prefix = key_prefix
 
-    def _generate_presigned_url(self, key: str, expires_in: int = 3600) -> str:
+    def _generate_presigned_url(
+        self,
+        key: str,
+        expires_in: int = 3600,
+        **params: t.Any,
+    ) -> str:
         """
         Returns a public URL with a limited lifetime.
 
         Arguments:
             key (str): Resource ID in S3 object storage.
             expires_in (int): The lifetime of the URL in seconds.
+            params: Additional parameters of the ``GetObject`` request.
         """
         return self.get_client().generate_presigned_url(
             'get_object',
             ExpiresIn=expires_in,
             Params={
-                'Bucket': self._bucket_name, 'Key': key,
+                'Bucket': self._bucket_name, 'Key': key, **params,
             },
         )
 
+    def _get_presigned_url(self, key: str) -> str:
+        """
+        Returns a signed URL from the cache or signs a new one.
+
+        Time is divided into windows of ``url_refresh_fraction``
+        of ``url_expires_in``. All URLs signed in a window expire
+        ``url_expires_in`` seconds after its start, the cached URL
+        is returned until the window ends and remains valid
+        at least for the rest of its lifetime.
+        """
+        now = time.time()
+        cached = self._url_cache.get(key)
+
+        if cached is not None and now < cached[1]:
+            return cached[0]
+
+        window = self.url_expires_in * self.url_refresh_fraction
+
+        if window <= 0:
+            return self._generate_presigned_url(key, self.url_expires_in)
+
+        started = now // window * window
+        expires_in = max(1, int(started + self.url_expires_in - now))
+        url = self._generate_presigned_url(key, expires_in)
+        self._url_cache[key] = (url, started + window)
+
+        return url
+
     def _make_key(self, lookup: str) -> str:
         """Returns the identifier of a resource in S3 object storage."""
         if self.key_prefix is None:
@@ -324,13 +709,63 @@ class S3Storage(AbstractStorage):
 
         return key
 
+    def _find_last_index(self, key_pattern: str) -> int:
+        """
+        Returns the last index in a sequence of existing objects
+        matching the given key pattern, otherwise 0.
+
+        Makes log(n) ``HEAD`` requests,
+        where n is the number of existing objects in sequence.
+        """
+        i = 1
+
+        while self._object_exists(key_pattern % i):
+            i = i * 2
+
+        a, b = (i // 2, i)
+
+        while a + 1 < b:
+            c = (a + b) // 2
+            a, b = (c, b) if self._object_exists(key_pattern % c) else (a, c)
+
+        return a
+
+    def _iter_free_keys(self, key: str) -> t.Iterator[t.Tuple[int, str]]:
+        """
+        Returns an iterator over the candidate keys for a new object
+        and their indexes: first the key itself,
+        then the keys with the ``_N`` suffix after the last used index.
+        """
+        yield 0, key
+
+        key_pattern = '%s_%%d%s' % os.path.splitext(key)
+        index = self._last_indexes.get(key_pattern)
+        collisions = 0
+
+        if index is None:
+            index = self._find_last_index(key_pattern)
+
+        while True:
+            index += 1
+            yield index, key_pattern % index
+
+            collisions += 1
+
+            # Other processes are saving into the same sequence
+            if collisions % 8 == 0:
+                index = max(index, self._find_last_index(key_pattern))
+
+    def exists(self, lookup: str) -> bool:
+        """Checks the existence of the object with one ``HEAD`` request."""
+        return self._object_exists(self._make_key(lookup))
+
     def _object_exists(self, key: str) -> bool:
         """
         Returns true if a file with the given key exists in S3 object storage,
         false otherwise.
         """
         try:
-            self.get_bucket().Object(key).load()
+            self.get_client().head_object(Bucket=self._bucket_name, Key=key)
             return True
         except ClientError:
             return False
@@ -341,10 +776,101 @@ class S3Storage(AbstractStorage):
         If a file with the key already exists in the S3 storage,
         this method is called to resolve the conflict.
         It should return a new key for the file.
+
+        The returned key is not reserved,
+        use :py:meth:`save` to create an object without overwriting.
         """
-        prefix, _ = os.path.splitext(key)
-        objects = self.get_bucket().objects.filter(Prefix=prefix)
-        return increment_path(key, (obj.key for obj in objects))
+        key_pattern = '%s_%%d%s' % os.path.splitext(key)
+        return key_pattern % (self._find_last_index(key_pattern) + 1)
+
+    @catch_client_error()
+    def commit_presigned_post(
+        self,
+        lookup: str,
+        content_type: t.Optional[str] = None,
+        min_size: int = 0,
+        max_size: t.Optional[int] = None,
+    ) -> str:
+        """
+        Checks the object uploaded with a presigned POST policy
+        with a ``HEAD`` request and returns the lookup.
+
+        Objects created otherwise are not accepted and never removed.
+        """
+        key = self._make_key(lookup)
+        client = self.get_client()
+        name, value = self.PRESIGNED_POST_METADATA
+
+        try:
+            head = client.head_object(Bucket=self._bucket_name, Key=key)
+        except ClientError as err:
+            raise FileNotFound(f'File with key {key!r} not found.') from err
+
+        if head.get('Metadata', {}).get(name) != value:
+            raise FileNotFound(
+                f'File with key {key!r} was not uploaded directly.'
+            )
+
+        size = head['ContentLength']
+        message = None
+
+        if max_size is None:
+            max_size = self.MAX_OBJECT_SIZE
+
+        if not min_size <= size <= max_size:
+            message = 'The size of the uploaded file is not allowed.'
+        elif content_type not in (None, head.get('ContentType')):
+            message = 'This file type is not allowed to be uploaded.'
+
+        if message is not None:
+            client.delete_object(Bucket=self._bucket_name, Key=key)
+            raise ValidationError(message)
+
+        return lookup
+
+    @catch_client_error()
+    def generate_presigned_post(
+        self,
+        filename: str,
+        content_type: t.Optional[str] = None,
+        min_size: int = 0,
+        max_size: t.Optional[int] = None,
+    ) -> PresignedPost:
+        """
+        Returns the parameters of a form for uploading a file
+        directly to S3 object storage.
+
+        The key is random, with the extension of the original filename,
+        the size and the type of the file are enforced by the policy,
+        which is valid for ``url_expires_in`` seconds.
+        The policy also marks the object for :py:meth:`commit_presigned_post`.
+        """
+        lookup = uuid.uuid4().hex + get_extension(filename).lower()
+        key = self._make_key(lookup)
+        name, value = self.PRESIGNED_POST_METADATA
+        fields: t.Dict[str, t.Any] = {f'x-amz-meta-{name}': value}
+        conditions: t.List[t.Any] = [{f'x-amz-meta-{name}': value}]
+
+        if min_size > 0 or max_size is not None:
+            conditions.append([
+                'content-length-range',
+                min_size,
+                self.MAX_OBJECT_SIZE if max_size is None else max_size,
+            ])
+
+        if content_type is not None:
+            fields['Content-Type'] = content_type
+            conditions.append({'Content-Type': content_type})
+
+        post = self.get_client().generate_presigned_post(
+            Bucket=self._bucket_name,
+            Key=key,
+            Fields=fields,
+            Conditions=conditions,
+            ExpiresIn=self.url_expires_in,
+        )
+
+        return PresignedPost(post['url'], post['fields'], lookup)
 
     def get_bucket(self) -> Bucket:
         """
@@ -375,7 +901,7 @@ class S3Storage(AbstractStorage):
             return self.get_url_pattern().format(
                 key=urllib.parse.quote(key)
             )
-        return self._generate_presigned_url(key, self.url_expires_in)
+        return self._get_presigned_url(key)
 
     def get_url_pattern(self) -> str:
         """
@@ -389,70 +915,417 @@ class S3Storage(AbstractStorage):
             self._url_pattern = url.replace(nbsp, '{key}')
         return self._url_pattern
 
+    @catch_client_error()
+    def list_files(
+        self,
+        prefix: str = '',
+        limit: int = 1000,
+        cursor: t.Optional[str] = None,
+        start_after: t.Optional[str] = None,
+    ) -> Page:
+        """
+        Returns a page of files in the order of keys.
+
+        Each page is one ``ListObjectsV2`` request,
+        the files have only the metadata returned by the listing,
+        the MIME type is guessed by the extension
+        and ``path_or_file`` is the URL returned by :py:meth:`get_url`:
+        built from the URL pattern for a public bucket,
+        or signed locally and cached for a private one.
+
+        Arguments:
+            prefix (str):
+                Only files whose lookup starts with the prefix.
+            limit (int):
+                The maximum number of files on the page,
+                at most ``1000``. Default to ``1000``.
+            cursor (str):
+                The cursor of the previous page to continue the listing.
+            start_after (str):
+                Only files whose lookup is after the given one.
+        """
+        if not 0 < limit <= 1000:
+            raise ValueError('The limit must be in the range [1, 1000].')
+
+        params: t.Dict[str, t.Any] = {
+            'Bucket': self._bucket_name,
+            'Prefix': self._make_key(prefix),
+            'MaxKeys': limit,
+        }
+
+        if cursor is not None:
+            params['ContinuationToken'] = cursor
+
+        if start_after is not None:
+            params['StartAfter'] = self._make_key(start_after)
+
+        response = self.get_client().list_objects_v2(**params)
+        files = [self._make_file(obj) for obj in response.get('Contents', [])]
+
+        if response.get('IsTruncated'):
+            return Page(files, response['NextContinuationToken'])
+
+        return Page(files)
+
+    def _make_file(self, obj: t.Mapping[str, t.Any]) -> File:
+        """Returns a ``File`` object for an item of the object listing."""
+        lookup = self._make_lookup(obj['Key'])
+
+        return File(
+            lookup=lookup,
+            path_or_file=self.get_url(lookup),
+            filename=os.path.basename(obj['Key']),
+            mimetype=guess_type(obj['Key'], use_external=True),
+            size=obj['Size'],
+            last_modified=obj['LastModified'],
+            etag=obj['ETag'].strip('"'),
+        )
+
     @catch_client_error(FileNotFound)
     def load(self, lookup: str) -> File:
-        bucket = self.get_bucket()
-        obj = bucket.Object(self._make_key(lookup))
+        """
+        Returns a ``File`` object with a stream over the object body.
 
-        file_obj = io.BytesIO()
-        obj.download_fileobj(file_obj)
-        file_obj.seek(0)
+        Only one request is made, the body is read as it is sent.
+        """
+        key = self._make_key(lookup)
+        client = self.get_client()
+        response = client.get_object(Bucket=self._bucket_name, Key=key)
+        reader = S3ObjectReader(client, self._bucket_name, key, response)
 
         return File(
             lookup=lookup,
-            path_or_file=file_obj,
-            filename=os.path.basename(obj.key),
-            mimetype=obj.content_type,
+            path_or_file=t.cast(t.BinaryIO, reader),
+            filename=os.path.basename(key),
+            mimetype=response.get('ContentType'),
+            size=response['ContentLength'],
+            last_modified=response['LastModified'],
+            etag=response['ETag'].strip('"'),
         )
 
+    def offload(self, lookup: str) -> t.Optional[Response]:
+        """
+        Returns a redirect to the object URL if ``offload_redirect`` is set.
+
+        Private objects are redirected to a presigned URL
+        that makes S3 send the object as an attachment.
+        The existence of the object is not checked,
+        S3 itself responds with an error to the client.
+        """
+        if not self.offload_redirect:
+            return None
+
+        if self.is_public:
+            url = self.get_url(lookup)
+        else:
+            key = self._make_key(lookup)
+            url = self._generate_presigned_url(
+                key,
+                self.url_expires_in,
+                ResponseContentDisposition=get_content_disposition(
+                    os.path.basename(key)
+                ),
+            )
+
+        return redirect(url)
+
     @catch_client_error()
     def remove(self, lookup: str) -> None:
         key = self._make_key(lookup)
+        self._url_cache.pop(key)
         self.get_bucket().Object(key).delete()
 
+    def remove_many(self, lookups: t.Iterable[str]) -> t.List[BatchResult]:
+        """
+        Deletes objects with ``DeleteObjects`` requests
+        of up to ``MAX_DELETE_KEYS`` keys each.
+        """
+        lookups = list(lookups)
+        keys = [self._make_key(lookup) for lookup in lookups]
+        unique_keys = list(dict.fromkeys(keys))
+        errors: t.Dict[str, Exception] = {}
+        client = self.get_client()
+
+        for start in range(0, len(unique_keys), self.MAX_DELETE_KEYS):
+            batch = unique_keys[start:start + self.MAX_DELETE_KEYS]
+
+            for key in batch:
+                self._url_cache.pop(key)
+
+            try:
+                response = client.delete_objects(
+                    Bucket=self._bucket_name,
+                    Delete={
+                        'Objects': [{'Key': key} for key in batch],
+                        'Quiet': True,
+                    },
+                )
+            except (BotoCoreError, ClientError) as err:
+                # Earlier batches are deleted, report the rest per lookup
+                code = None
+
+                if isinstance(err, ClientError):
+                    code = err.response.get('Error', {}).get('Code')
+
+                for key in batch:
+                    errors[key] = self._make_error(code, str(err))
+                    errors[key].__cause__ = err
+                continue
+
+            for error in response.get('Errors', []):
+                errors[error['Key']] = self._make_error(
+                    error.get('Code'),
+                    '{}: {}'.format(error.get('Code'), error.get('Message')),
+                )
+
+        return [
+            BatchResult(lookup, errors.get(key))
+            for lookup, key in zip(lookups, keys)
+        ]
+
+    def _make_error(self, code: t.Optional[str], message: str) -> Exception:
+        """Returns the exception for the error code of a failed request."""
+        return self.ERROR_TYPES.get(code or '', PermissionDenied)(message)
+
     @catch_client_error()
     def save(self, storage: FileStorage, overwrite: bool = False) -> str:
-        bucket = self.get_bucket()
+        """
+        Saves the uploaded file and returns an identifier for searching.
+
+        Without overwriting, the object is created with a conditional write,
+        so the common case takes one request. If the key is taken,
+        the next free ``_N`` suffix is found with ``HEAD`` requests.
+        """
         key = self._make_key(
             self.generate_filename(storage)
         )
+        content_type = guess_type(key, use_external=True) or storage.mimetype
+        info = get_upload_info(storage)
+        digest = info.digest if info is not None else None
+        stream = t.cast(t.BinaryIO, storage.stream)
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
 
-        if not overwrite and self._object_exists(key):
-            key = self._resolve_conflict(key)
+        if overwrite:
+            self._upload(stream, key, size, content_type, digest=digest)
+            return self._make_lookup(key)
 
-        content_type = guess_type(key, use_external=True) or storage.mimetype
+        key_pattern = '%s_%%d%s' % os.path.splitext(key)
+        candidates = self._iter_free_keys(key)
+        index, key = next(candidates)
+
+        while True:
+            exclusive = self.conditional_writes
+            # A rejected multipart upload would have to be sent again
+            check = not exclusive or size >= self.multipart_threshold
+
+            if check and self._object_exists(key):
+                index, key = next(candidates)
+                continue
+
+            try:
+                self._upload(
+                    stream, key, size, content_type, exclusive, digest
+                )
+                break
+            except ClientError as err:
+                code = err.response.get('Error', {}).get('Code')
+
+                if exclusive and self._is_unsupported(err):
+                    self.conditional_writes = False
+                    continue
+
+                if not exclusive or code not in self.CONFLICT_ERRORS:
+                    raise
+
+            index, key = next(candidates)
+
+        if index:
+            self._last_indexes[key_pattern] = index
+
+        return self._make_lookup(key)
+
+    def _is_unsupported(self, err: ClientError) -> bool:
+        """
+        Returns true if the service rejected the ``If-None-Match`` header.
+
+        Arguments:
+            err (ClientError): The error of a conditional write.
+        """
+        error = err.response.get('Error', {})
+        code = error.get('Code')
+
+        if code in self.UNSUPPORTED_ERRORS:
+            return True
+
+        if code != 'InvalidArgument':
+            return False
+
+        # Other invalid arguments must not disable conditional writes
+        details = '%s %s' % (
+            error.get('ArgumentName', ''), error.get('Message', '')
+        )
+        return 'if-none-match' in details.lower()
+
+    @catch_client_error(FileNotFound)
+    def stat(self, lookup: str) -> FileStat:
+        """Returns the metadata of the object with one ``HEAD`` request."""
+        key = self._make_key(lookup)
+        head = self.get_client().head_object(
+            Bucket=self._bucket_name, Key=key
+        )
+
+        return FileStat(
+            lookup=lookup,
+            size=head['ContentLength'],
+            mtime=head['LastModified'],
+            digest=head.get('Metadata', {}).get('digest'),
+            mimetype=head.get('ContentType'),
+            etag=head['ETag'].strip('"'),
+        )
 
-        bucket.put_object(
+    def _upload(
+        self,
+        stream: t.BinaryIO,
+        key: str,
+        size: int,
+        content_type: t.Optional[str],
+        exclusive: bool = False,
+        digest: t.Optional[str] = None,
+    ) -> None:
+        """
+        Uploads the stream with one request or in parts.
+
+        Arguments:
+            stream (t.BinaryIO): The stream to upload.
+            key (str): Resource ID in S3 object storage.
+            size (int): The size of the stream in bytes.
+            content_type (str): The MIME type of the object.
+            exclusive (bool): Fail if the object already exists.
+            digest (str): The hash sum stored in the object metadata.
+        """
+        stream.seek(0)
+        params: t.Dict[str, t.Any] = {}
+
+        if content_type:
+            params['ContentType'] = content_type
+
+        if digest:
+            params['Metadata'] = {'digest': digest}
+
+        if size >= self.multipart_threshold:
+            self._upload_multipart(stream, key, size, exclusive, **params)
+            return
+
+        if exclusive:
+            params['IfNoneMatch'] = '*'
+
+        self.get_client().put_object(
+            Bucket=self._bucket_name,
             Key=key,
-            Body=storage.stream,
-            ContentType=content_type,
+            Body=stream,
+            **params,
         )
 
-        return self._make_lookup(key)
+    def _upload_multipart(
+        self,
+        stream: t.BinaryIO,
+        key: str,
+        size: int,
+        exclusive: bool = False,
+        **params: t.Any,
+    ) -> None:
+        """
+        Uploads the stream in parts of ``multipart_chunksize`` bytes
+        using ``max_concurrency`` threads.
+
+        The stream is read sequentially, the number of parts in memory
+        is bounded. If any part fails, the upload is aborted,
+        so no incomplete parts are left in the bucket.
 
+        Arguments:
+            stream (t.BinaryIO): The stream to upload.
+            key (str): Resource ID in S3 object storage.
+            size (int): The size of the stream in bytes.
+            exclusive (bool): Fail if the object already exists.
+            params: Additional parameters of ``CreateMultipartUpload``.
+        """
+        client = self.get_client()
+        chunksize = max(self.multipart_chunksize, -(-size // self.MAX_PARTS))
+        upload_id = client.create_multipart_upload(
+            Bucket=self._bucket_name, Key=key, **params
+        )['UploadId']
+        slots = threading.Semaphore(self.max_concurrency)
+        failed = threading.Event()
+        futures: t.List[Future[t.Any]] = []
+
+        def on_done(future: Future[t.Any]) -> None:
+            if future.exception() is not None:
+                failed.set()
+            slots.release()
 
-@catch_client_error()
-def iter_files(storage: S3Storage) -> t.Iterable[File]:
+        try:
+            with ThreadPoolExecutor(self.max_concurrency) as executor:
+                for number in itertools.count(1):
+                    slots.acquire()
+                    chunk = stream.read(chunksize)
+
+                    if failed.is_set() or (not chunk and number > 1):
+                        slots.release()
+                        break
+
+                    future = executor.submit(
+                        client.upload_part,
+                        Bucket=self._bucket_name,
+                        Key=key,
+                        UploadId=upload_id,
+                        PartNumber=number,
+                        Body=chunk,
+                    )
+                    future.add_done_callback(on_done)
+                    futures.append(future)
+
+            parts: t.List[t.Any] = [
+                {'ETag': f.result()['ETag'], 'PartNumber': number}
+                for number, f in enumerate(futures, 1)
+            ]
+            complete_params: t.Dict[str, t.Any] = {}
+
+            if exclusive:
+                complete_params['IfNoneMatch'] = '*'
+
+            client.complete_multipart_upload(
+                Bucket=self._bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts},
+                **complete_params,
+            )
+        except BaseException:
+            client.abort_multipart_upload(
+                Bucket=self._bucket_name, Key=key, UploadId=upload_id
+            )
+            raise
+
+
+def iter_files(
+    storage: S3Storage,
+    prefix: str = '',
+    page_size: int = 1000,
+) -> t.Iterable[File]:
     """
     Returns an iterator over all files in the given S3 storage.
 
-    This function cannot be used in a production environment!
+    The files are read page by page
+    with :py:meth:`S3Storage.list_files`, one request per page.
     """
-    q = storage.get_bucket().objects
-
-    if storage.key_prefix is None:
-        objects = q.all()
-    else:
-        objects = q.filter(Prefix=storage.key_prefix)
-
-    for obj in objects:
-        yield File(
-            lookup=storage._make_lookup(obj.key),
-            path_or_file=storage.get_url(obj.key),
-            filename=os.path.basename(obj.key),
-            mimetype=getattr(
-                obj,
-                'content_type',
-                guess_type(obj.key, use_external=True)
-            )
-        )
+    cursor = None
+
+    while True:
+        page = storage.list_files(prefix, page_size, cursor)
+        yield from page.files
+
+        if page.cursor is None:
+            break
+
+        cursor = page.cursor
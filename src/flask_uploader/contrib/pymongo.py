@@ -1,42 +1,159 @@
 from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timezone
+import io
 import os
 import re
+import threading
 import typing as t
 
 from bson.errors import InvalidId
 from bson.objectid import ObjectId
 from gridfs import GridFSBucket
 from gridfs.errors import NoFile
-from pymongo import ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
 from ..exceptions import FileNotFound, InvalidLookup
 from ..formats import guess_type
-from ..storages import AbstractStorage, File
+from ..inspection import get_upload_info
+from ..storages import AbstractStorage, BatchResult, File, FileStat
 
 if t.TYPE_CHECKING:
     from flask_pymongo import PyMongo
     from gridfs.grid_file import GridOut
     from pymongo.client_session import ClientSession
+    from pymongo.database import Database
     from werkzeug.datastructures import FileStorage
     from ..typing import FilenameStrategyCallable
 
 
-__all__ = ('GridFSStorage', 'Lookup')
+__all__ = ('GridFSReader', 'GridFSStorage', 'Lookup')
+
+
+_ENCODED_LOOKUP_RE = re.compile(r'^([0-9a-f]{24})/(.+)$')
+
+
+def get_content_type(
+    metadata: t.Optional[t.Mapping[str, t.Any]],
+) -> t.Optional[str]:
+    """
+    Returns the MIME type from the metadata of the file.
+
+    Earlier versions saved it as an array of one element.
+    """
+    content_type = (metadata or {}).get('contentType')
+
+    if isinstance(content_type, (list, tuple)):
+        return content_type[0] if content_type else None
+
+    return content_type
+
+
+def make_etag(grid_out: GridOut) -> str:
+    """
+    Returns the entity tag of the file.
+
+    The identifier is kept when the file is overwritten,
+    so the upload date is also taken into account.
+    """
+    return '%s-%x' % (grid_out._id, int(grid_out.upload_date.timestamp()))
 
 
 class Bucket(GridFSBucket):
+    def __init__(
+        self,
+        db: Database[t.Any],
+        bucket_name: str = 'fs',
+        **kwargs: t.Any,
+    ) -> None:
+        super().__init__(db, bucket_name, **kwargs)
+        self.files = db[f'{bucket_name}.files']
+        self.chunks = db[f'{bucket_name}.chunks']
+        self.counters = db[f'{bucket_name}.counters']
+
+    def create_indexes(self) -> None:
+        """
+        Creates the indexes used by GridFS and by the storage,
+        if they do not exist.
+        """
+        self.files.create_index([
+            ('filename', ASCENDING), ('uploadDate', ASCENDING),
+        ])
+        self.files.create_index([('metadata.index', ASCENDING)])
+        self.chunks.create_index(
+            [('files_id', ASCENDING), ('n', ASCENDING)], unique=True
+        )
+
+    def claim_filename(self, filename: str) -> bool:
+        """
+        Atomically claims the name of a new file
+        and returns true if no other upload has claimed it.
+
+        The claim is kept in the counter of the name's suffixes,
+        so concurrent uploads of the same name get different names.
+        """
+        file_pattern = '%s_%%d%s' % os.path.splitext(filename)
+
+        try:
+            self.counters.find_one_and_update(
+                {'_id': file_pattern, 'claimed': {'$ne': True}},
+                {
+                    '$set': {'claimed': True},
+                    '$setOnInsert': {
+                        'seq': self.get_last_index(file_pattern),
+                    },
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # The counter exists and the name has been claimed
+            return False
+
+        return True
+
+    def release_filenames(
+        self,
+        filenames: t.Iterable[str],
+        session: t.Optional[ClientSession] = None,
+    ) -> None:
+        """Releases the claims of the removed files."""
+        patterns = [
+            '%s_%%d%s' % os.path.splitext(filename) for filename in filenames
+        ]
+
+        if patterns:
+            self.counters.update_many(
+                {'_id': {'$in': patterns}},
+                {'$unset': {'claimed': ''}},
+                session=session,
+            )
+
     def delete_file(
         self,
         filename: str,
         session: t.Optional[ClientSession] = None,
     ) -> None:
         """Removes all versions of a file with the given name."""
-        cursor = (
-            self.find({'filename': filename})
-                .sort('uploadDate', ASCENDING)
+        cursor = self.files.find(
+            {'filename': filename}, {'_id': 1}, session=session
         )
-        for grid_out in cursor:
-            self.delete(grid_out._id, session=session)
+        self.delete_ids([doc['_id'] for doc in cursor], session=session)
+
+    def delete_ids(
+        self,
+        ids: t.Sequence[ObjectId],
+        session: t.Optional[ClientSession] = None,
+    ) -> None:
+        """
+        Removes the files with the given identifiers
+        with one query to each of the files and chunks collections.
+        """
+        if ids:
+            self.files.delete_many({'_id': {'$in': ids}}, session=session)
+            self.chunks.delete_many(
+                {'files_id': {'$in': ids}}, session=session
+            )
 
     def find_last_version(
         self,
@@ -59,27 +176,223 @@ class Bucket(GridFSBucket):
         Returns the last index found
         for the given filename pattern, otherwise 0.
         """
-        file_pattern = re.escape(file_pattern).replace('%d', r'(\d+)')
+        # Anchored at the start, so the index on the filename is used
+        file_pattern = '^%s$' % re.escape(file_pattern).replace('%d', r'\d+')
+        found = self.files.find_one(
+            {'filename': {'$regex': file_pattern}},
+            {'metadata.index': True},
+            sort=[('metadata.index', DESCENDING)],
+        )
 
-        try:
-            found = next(
-                self.find({'filename': {'$regex': file_pattern}})
-                    .sort('metadata.index', DESCENDING)
-                    .limit(1)
-            )
-            return int(found.metadata['index'])
-        except StopIteration:
+        if found is None:
             return 0
 
+        return int(found.get('metadata', {}).get('index', 0))
+
+    def next_index(self, file_pattern: str) -> int:
+        """
+        Returns the next free index for the given filename pattern.
+
+        Indexes are handed out by an atomic increment of a counter,
+        so concurrent calls never get the same index.
+        The counter is created from the last index of existing files.
+        """
+        counter = self.counters.find_one_and_update(
+            {'_id': file_pattern},
+            {'$inc': {'seq': 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+        if counter is None:
+            try:
+                self.counters.update_one(
+                    {'_id': file_pattern},
+                    {'$max': {'seq': self.get_last_index(file_pattern)}},
+                    upsert=True,
+                )
+            except DuplicateKeyError:
+                # The counter has been created concurrently
+                pass
+
+            counter = self.counters.find_one_and_update(
+                {'_id': file_pattern},
+                {'$inc': {'seq': 1}},
+                return_document=ReturnDocument.AFTER,
+            )
+
+        return int(counter['seq'])  # type: ignore
+
+
+class GridFSReader(io.RawIOBase):
+    """
+    A seekable read-only stream over a file in GridFS.
+
+    The file is read in blocks that are a multiple of its chunk size,
+    so each block is fetched with one query instead of one per chunk.
+    A seek moves the ``GridOut`` cursor directly to the chunk
+    containing the new position, as needed for ``Range`` requests.
+    Optionally, the next block is fetched in a background thread
+    while the current one is being sent.
+    """
+
+    def __init__(
+        self,
+        grid_out: GridOut,
+        read_chunks: int = 4,
+        prefetch: bool = False,
+    ) -> None:
+        """
+        Arguments:
+            grid_out (GridOut):
+                The file opened for reading.
+            read_chunks (int):
+                The number of GridFS chunks read at once. Default to ``4``.
+            prefetch (bool):
+                Read the next block in a background thread.
+                Default to ``False``.
+        """
+        if read_chunks < 1:
+            raise ValueError('The read_chunks argument must be positive.')
+
+        super().__init__()
+        self.grid_out = grid_out
+        self.block_size = grid_out.chunk_size * read_chunks
+        self.prefetch = prefetch
+        self._block = b''
+        self._block_offset = 0
+        self._executor: t.Optional[ThreadPoolExecutor] = None
+        self._pending: t.Optional[Future[bytes]] = None
+        self._position = 0
+
+    def _cancel_prefetch(self) -> None:
+        if self._pending is not None:
+            if not self._pending.cancel():
+                # GridOut is not thread-safe, wait for the read in progress.
+                self._pending.exception()
+            self._pending = None
+
+    def _next_block(self) -> bytes:
+        """Returns the block starting at the current position."""
+        if self._pending is not None:
+            block = self._pending.result()
+            self._pending = None
+        else:
+            block = self._read_block()
+
+        end = self._position + len(block)
+
+        if self.prefetch and block and end < self.grid_out.length:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(1)
+            self._pending = self._executor.submit(self._read_block)
+
+        return block
+
+    def _read_block(self) -> bytes:
+        """
+        Reads up to the end of the block,
+        which is aligned to the chunk boundaries.
+        """
+        position = self.grid_out.tell()
+        size = self.block_size - position % self.grid_out.chunk_size
+        return self.grid_out.read(size)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._cancel_prefetch()
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+            self.grid_out.close()
+        super().close()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: t.Any) -> int:
+        if self._block_offset >= len(self._block):
+            self._block = self._next_block()
+            self._block_offset = 0
+
+        data = self._block[
+            self._block_offset:self._block_offset + len(buffer)
+        ]
+        size = len(data)
+        buffer[:size] = data
+        self._block_offset += size
+        self._position += size
+
+        return size
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self.grid_out.length
+
+        if offset < 0:
+            raise ValueError(f'Negative seek position {offset}.')
+
+        if offset != self._position:
+            self._cancel_prefetch()
+            self._block = b''
+            self._block_offset = 0
+            self.grid_out.seek(offset)
+            self._position = offset
+
+        return self._position
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
 
 class Lookup(str):
     """
     A search identifier that is both a string and stores a native identifier.
+
+    The string form is either a filename or, if the identifier is encoded,
+    ``<oid>/<filename>``, which survives the round trip through URLs.
     """
 
     def __init__(self, value: str) -> None:
         self._oid: t.Optional[ObjectId] = None
 
+    @classmethod
+    def from_oid(cls, oid: ObjectId, filename: str) -> Lookup:
+        """Returns a lookup whose string form contains the identifier."""
+        lookup = cls(f'{oid}/{filename}')
+        lookup.oid = oid
+        return lookup
+
+    @classmethod
+    def parse(cls, value: str) -> Lookup:
+        """
+        Returns a lookup with the identifier
+        if the string has the ``<oid>/<filename>`` form.
+        """
+        if isinstance(value, cls):
+            return value
+
+        lookup = cls(value)
+        match = _ENCODED_LOOKUP_RE.match(value)
+
+        if match is not None:
+            lookup.oid = match.group(1)
+
+        return lookup
+
+    @property
+    def filename(self) -> str:
+        """The name of the file in GridFS."""
+        if self._oid is not None:
+            prefix = f'{self._oid}/'
+            if self.startswith(prefix):
+                return self[len(prefix):]
+        return str(self)
+
     def __repr__(self) -> str:
         return '<{} filename={!r} oid={!r}>'.format(
             self.__class__.__name__, str(self), self.oid
@@ -102,22 +415,92 @@ class Lookup(str):
 class GridFSStorage(AbstractStorage):
     """File storage in the MongoDB database."""
 
-    __slots__ = ('mongo', 'collection')
+    __slots__ = (
+        '_buckets',
+        'collection',
+        'create_indexes',
+        'encode_oid',
+        '_lock',
+        'mongo',
+        'prefetch',
+        'read_chunks',
+    )
 
     def __init__(
         self,
         mongo: PyMongo,
         collection: str,
         filename_strategy: t.Optional[FilenameStrategyCallable] = None,
+        create_indexes: bool = True,
+        encode_oid: bool = False,
+        read_chunks: int = 4,
+        prefetch: bool = False,
     ) -> None:
         """
         Arguments
             mongo (PyMongo): A instance of the extension of Flask-Pymongo.
             collection (str): The MongoDB collection in which files are saved.
+            create_indexes (bool):
+                Create the indexes used by the storage
+                on the first access to each database. Default to ``True``.
+            encode_oid (bool):
+                Return lookups in the ``<oid>/<filename>`` form
+                and accept them in ``load`` and ``remove``,
+                which turns both into a primary key query.
+                Default to ``False``.
+            read_chunks (int):
+                The number of GridFS chunks read at once
+                when the file is sent. Default to ``4``.
+            prefetch (bool):
+                Read the next block of the file in a background thread
+                while the current one is being sent. Default to ``False``.
         """
         super().__init__(filename_strategy=filename_strategy)
         self.mongo = mongo
         self.collection = collection
+        self.create_indexes = create_indexes
+        self.encode_oid = encode_oid
+        self.read_chunks = read_chunks
+        self.prefetch = prefetch
+        self._buckets: t.Dict[Database[t.Any], Bucket] = {}
+        self._lock = threading.Lock()
+
+    def _make_lookup(self, oid: ObjectId, filename: str) -> Lookup:
+        if self.encode_oid:
+            return Lookup.from_oid(oid, filename)
+        lookup = Lookup(filename)
+        lookup.oid = oid
+        return lookup
+
+    def _parse_lookup(self, lookup: str) -> Lookup:
+        if isinstance(lookup, Lookup):
+            return lookup
+        if self.encode_oid:
+            return Lookup.parse(lookup)
+        return Lookup(lookup)
+
+    def _find_document(
+        self,
+        lookup: str,
+        projection: t.Mapping[str, t.Any],
+    ) -> t.Optional[t.Mapping[str, t.Any]]:
+        """
+        Returns the fields of the last version of the file document
+        by its identifier or name, or ``None``.
+        """
+        parsed = self._parse_lookup(lookup)
+        files = self.get_bucket().files
+
+        if parsed.oid is None:
+            return files.find_one(
+                {'filename': parsed.filename},
+                projection,
+                sort=[('uploadDate', DESCENDING)],
+            )
+
+        return files.find_one(
+            {'_id': parsed.oid, 'filename': parsed.filename}, projection
+        )
 
     def _resolve_conflict(self, filename: str) -> t.Tuple[str, int]:
         """
@@ -126,16 +509,51 @@ class GridFSStorage(AbstractStorage):
         It should return a new filename and index.
         """
         filename_pattern = '%s_%%d%s' % os.path.splitext(filename)
-        index = self.get_bucket().get_last_index(filename_pattern) + 1
+        index = self.get_bucket().next_index(filename_pattern)
         return filename_pattern % index, index
 
+    def exists(self, lookup: str) -> bool:
+        return self._find_document(lookup, {'_id': 1}) is not None
+
     def get_bucket(self) -> Bucket:
-        """Returns an object for working with GridFS."""
-        return Bucket(self.mongo.db, self.collection)
+        """
+        Returns an object for working with GridFS.
+
+        The object is created once for each database,
+        along with the indexes if ``create_indexes`` is set.
+        """
+        db = self.mongo.db
+        bucket = self._buckets.get(db)  # type: ignore
+
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(db)  # type: ignore
+
+                if bucket is None:
+                    bucket = Bucket(db, self.collection)  # type: ignore
+
+                    if self.create_indexes:
+                        bucket.create_indexes()
+
+                    self._buckets[db] = bucket  # type: ignore
+
+        return bucket
 
     def load(self, lookup: str) -> File:
         bucket = self.get_bucket()
-        grid_out = bucket.find_last_version(lookup)
+        parsed = self._parse_lookup(lookup)
+        grid_out: t.Optional[GridOut]
+
+        if parsed.oid is None:
+            grid_out = bucket.find_last_version(parsed.filename)
+        else:
+            try:
+                grid_out = bucket.open_download_stream(parsed.oid)
+            except NoFile:
+                grid_out = None
+            else:
+                if grid_out.filename != parsed.filename:
+                    grid_out = None
 
         if grid_out is None:
             raise FileNotFound(
@@ -143,32 +561,98 @@ class GridFSStorage(AbstractStorage):
                 f'in GridFS collection {self.collection!r}.'
             )
 
+        reader = GridFSReader(grid_out, self.read_chunks, self.prefetch)
+
         return File(
             lookup=lookup,
-            path_or_file=t.cast(t.BinaryIO, grid_out),
+            path_or_file=t.cast(t.BinaryIO, reader),
             filename=os.path.basename(grid_out.filename),
-            mimetype=grid_out.metadata['contentType'],  # type: ignore
+            mimetype=get_content_type(grid_out.metadata),
+            size=grid_out.length,
+            last_modified=grid_out.upload_date,
+            etag=make_etag(grid_out),
         )
 
     def remove(self, lookup: str) -> None:
-        self.get_bucket().delete_file(lookup)
+        bucket = self.get_bucket()
+        parsed = self._parse_lookup(lookup)
+
+        if parsed.oid is None:
+            bucket.delete_file(parsed.filename)
+        else:
+            # The identifier is only removed together with its filename
+            doc = self._find_document(lookup, {'_id': 1})
+
+            if doc is None:
+                return
+
+            bucket.delete_ids([doc['_id']])
+
+        bucket.release_filenames([parsed.filename])
+
+    def remove_many(self, lookups: t.Iterable[str]) -> t.List[BatchResult]:
+        """
+        Deletes files with one query to find the identifiers
+        of the files given by name or identifier and one ``delete_many``
+        on each of the files and chunks collections.
+        """
+        bucket = self.get_bucket()
+        lookups = list(lookups)
+        filenames: t.List[str] = []
+        clauses: t.List[t.Dict[str, t.Any]] = []
+        removed: t.Set[str] = set()
+
+        try:
+            for lookup in lookups:
+                parsed = self._parse_lookup(lookup)
+
+                if parsed.oid is None:
+                    filenames.append(parsed.filename)
+                else:
+                    clauses.append({
+                        '_id': parsed.oid, 'filename': parsed.filename,
+                    })
+
+            if filenames:
+                clauses.append({'filename': {'$in': filenames}})
+
+            if clauses:
+                cursor = bucket.files.find(
+                    {'$or': clauses}, {'_id': 1, 'filename': 1}
+                )
+                ids = []
+
+                for doc in cursor:
+                    ids.append(doc['_id'])
+                    removed.add(doc['filename'])
+
+                bucket.delete_ids(ids)
+                bucket.release_filenames(removed)
+        except Exception as err:
+            return [BatchResult(lookup, err) for lookup in lookups]
+
+        return [BatchResult(lookup) for lookup in lookups]
 
     def save(self, storage: FileStorage, overwrite: bool = False) -> Lookup:
         bucket = self.get_bucket()
         filename = self.generate_filename(storage)
+        info = get_upload_info(storage)
         metadata: t.Dict[str, t.Any] = {
             'contentType': (
-                guess_type(filename, use_external=True) or storage.mimetype,
-            )
+                guess_type(filename, use_external=True) or storage.mimetype
+            ),
         }
+
+        if info is not None and info.digest is not None:
+            metadata['digest'] = info.digest
+
         found = bucket.find_last_version(filename)
 
         if found and overwrite:
             if found.metadata is not None:
                 metadata.update()
 
-            lookup = Lookup(filename)
-            lookup.oid = found._id
+            lookup = self._make_lookup(found._id, filename)
 
             bucket.delete(found._id)
             bucket.upload_from_stream_with_id(
@@ -180,17 +664,56 @@ class GridFSStorage(AbstractStorage):
 
             return lookup
 
-        if found and not overwrite:
+        # The claim is atomic, as an exclusive create of the name,
+        # so uploads of the same name at the same time never share it
+        claimed = not found and bucket.claim_filename(filename)
+
+        if not claimed:
             filename, metadata['index'] = self._resolve_conflict(filename)
 
-        lookup = Lookup(filename)
-        lookup.oid = bucket.upload_from_stream(
-            filename,
-            storage.stream,
-            metadata=metadata,
+        try:
+            oid = bucket.upload_from_stream(
+                filename,
+                storage.stream,
+                metadata=metadata,
+            )
+        except Exception:
+            if claimed:
+                bucket.release_filenames([filename])
+            raise
+
+        return self._make_lookup(oid, filename)
+
+    def stat(self, lookup: str) -> FileStat:
+        """
+        Returns the metadata of the file
+        with a query to the files collection without the chunks.
+        """
+        doc = self._find_document(
+            lookup, {'length': 1, 'uploadDate': 1, 'metadata': 1}
         )
 
-        return lookup
+        if doc is None:
+            raise FileNotFound(
+                f'File with lookup {lookup!r} not found '
+                f'in GridFS collection {self.collection!r}.'
+            )
+
+        metadata = doc.get('metadata') or {}
+        upload_date = doc['uploadDate']
+        mtime = upload_date
+
+        if mtime.tzinfo is None:
+            mtime = mtime.replace(tzinfo=timezone.utc)
+
+        return FileStat(
+            lookup=lookup,
+            size=doc['length'],
+            mtime=mtime,
+            digest=metadata.get('digest'),
+            mimetype=get_content_type(metadata),
+            etag='%s-%x' % (doc['_id'], int(upload_date.timestamp())),
+        )
 
 
 def iter_files(storage: GridFSStorage) -> t.Iterable[File]:
@@ -203,8 +726,8 @@ def iter_files(storage: GridFSStorage) -> t.Iterable[File]:
     """
     for grid_out in storage.get_bucket().find():
         yield File(
-            lookup=grid_out.filename,
+            lookup=storage._make_lookup(grid_out._id, grid_out.filename),
             path_or_file=t.cast(t.BinaryIO, grid_out),
             filename=os.path.basename(grid_out.filename),
-            mimetype=grid_out.metadata['contentType'],
+            mimetype=get_content_type(grid_out.metadata),
         )
@@ -12,7 +12,7 @@ from wtforms.validators import (
 from werkzeug.datastructures import FileStorage
 
 from .. import validators as vd
-from ..exceptions import ValidationError
+from ..exceptions import FileNotFound, ValidationError
 
 if t.TYPE_CHECKING:
     from ..core import Uploader
@@ -79,6 +79,7 @@ class UploadField(FileField):
         overwrite: bool = False,
         return_url: bool = False,
         external: bool = False,
+        direct_upload: bool = False,
         **kwargs: t.Any,
     ) -> None:
         """
@@ -97,6 +98,12 @@ class UploadField(FileField):
                 After saving, return the URL of the file. Default to ``False``.
             external (bool):
                 Generate absolute URL. Default to ``False``.
+            direct_upload (bool):
+                The file is uploaded directly to the storage, see
+                :py:meth:`~flask_uploader.core.Uploader.generate_presigned_post`,
+                and the form submits its lookup instead of the file.
+                The lookup is checked by the uploader during validation.
+                Default to ``False``.
         """
         super().__init__(label, validators, **kwargs)
         self.data: t.Optional[t.Union[str, FileStorage]] = None
@@ -104,6 +111,7 @@ class UploadField(FileField):
         self.overwrite = overwrite
         self.return_url = return_url
         self.external = external
+        self.direct_upload = direct_upload
 
     def populate_obj(self, obj: t.Any, name: str) -> None:
         """
@@ -122,26 +130,54 @@ class UploadField(FileField):
         self.save()
         super().populate_obj(obj, name)
 
+    def process_formdata(self, valuelist: t.List[t.Any]) -> None:
+        """Accepts the lookup of a directly uploaded file as a string."""
+        if self.direct_upload:
+            lookup = next(
+                (v for v in valuelist if isinstance(v, str) and v), None
+            )
+
+            if lookup is not None:
+                self.data = lookup
+                return
+
+        super().process_formdata(valuelist)
+
+    def _is_direct_upload(self) -> bool:
+        """Returns true if the form submitted a directly uploaded file."""
+        return self.direct_upload and bool(self.data) and isinstance(
+            self.data, str
+        )
+
     def post_validate(self, form: Form, validation_stopped: bool) -> None:
         """Runs validators from the uploader."""
-        if not validation_stopped and file_is_selected(self):
-            try:
+        if validation_stopped:
+            return
+
+        try:
+            if self._is_direct_upload():
+                self.data = self.uploader.commit_presigned_post(
+                    self.data  # type: ignore
+                )
+            elif file_is_selected(self):
                 self.uploader.validate(self.data)  # type: ignore
-            except ValidationError as err:
-                raise WTFValidationError(str(err)) from err
+        except (FileNotFound, ValidationError) as err:
+            raise WTFValidationError(str(err)) from err
 
     def save(self) -> t.Optional[str]:
         """Saves the uploaded file and returns an identifier for searching."""
-        if file_is_selected(self):
+        if self._is_direct_upload():
+            lookup = t.cast(str, self.data)
+        elif file_is_selected(self):
             self.data = lookup = self.uploader.save(
                 storage=self.data,  # type: ignore
                 overwrite=self.overwrite,
                 skip_validation=True,
             )
+        else:
+            return None
 
-            if self.return_url:
-                self.data = self.uploader.get_url(lookup, external=self.external)
-
-            return lookup
+        if self.return_url:
+            self.data = self.uploader.get_url(lookup, external=self.external)
 
-        return None
+        return lookup
@@ -1,4 +1,6 @@
 from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 import typing as t
 import weakref
 
@@ -7,9 +9,16 @@ from flask import (
     url_for,
 )
 
+from werkzeug.datastructures import FileStorage
+
+from .formats import guess_type
+from .inspection import inspect_upload
+from .storages import BatchResult
+from .validators import Extension, FileSize
+
 if t.TYPE_CHECKING:
-    from werkzeug.datastructures import FileStorage
-    from .storages import AbstractStorage, File
+    from werkzeug.wrappers import Response
+    from .storages import AbstractStorage, File, FileStat, PresignedPost
     from .typing import ValidatorCallable
 
     Cache = weakref.WeakValueDictionary[str, 'Uploader']
@@ -118,6 +127,75 @@ class Uploader(metaclass=UploaderMeta):
             self.__class__.__name__, self.name
         )
 
+    @property
+    def storage(self) -> AbstractStorage:
+        """The storage instance for file manipulation."""
+        return self._storage
+
+    def _get_post_conditions(self, filename: str) -> t.Dict[str, t.Any]:
+        """
+        Returns the conditions of a direct upload
+        derived from the ``FileSize`` and ``Extension`` validators.
+        """
+        conditions: t.Dict[str, t.Any] = {}
+
+        for validator in self.validators:
+            if isinstance(validator, FileSize):
+                conditions['min_size'] = max(
+                    conditions.get('min_size', 0),
+                    int(validator.min_size),
+                )
+                conditions['max_size'] = min(
+                    conditions.get('max_size', int(validator.max_size)),
+                    int(validator.max_size),
+                )
+            elif isinstance(validator, Extension):
+                # The same type as the storage sets when saving the file
+                conditions['content_type'] = (
+                    guess_type(filename, use_external=True)
+                    or 'application/octet-stream'
+                )
+
+        return conditions
+
+    def commit_presigned_post(self, lookup: str) -> str:
+        """
+        Checks the file uploaded directly to the storage
+        and returns an identifier for searching.
+
+        Only the conditions of the ``FileSize`` and ``Extension`` validators
+        are checked, other validators require the contents of the file.
+
+        Arguments:
+            lookup (str):
+                The identifier returned by :py:meth:`generate_presigned_post`.
+        """
+        return self._storage.commit_presigned_post(
+            lookup, **self._get_post_conditions(lookup)
+        )
+
+    def generate_presigned_post(self, filename: str) -> PresignedPost:
+        """
+        Returns the parameters of a form for uploading a file
+        directly to the storage, bypassing the application.
+
+        The extension of the filename is checked by ``Extension`` validators,
+        the file size and MIME type are enforced by the storage.
+
+        Arguments:
+            filename (str):
+                The original name of the file selected by the user.
+        """
+        storage = FileStorage(filename=filename)
+
+        for validator in self.validators:
+            if isinstance(validator, Extension):
+                validator(storage)
+
+        return self._storage.generate_presigned_post(
+            filename, **self._get_post_conditions(filename)
+        )
+
     def get_url(self, lookup: str, external: bool = False) -> str:
         """
         Returns the URL to the given file.
@@ -153,14 +231,33 @@ class Uploader(metaclass=UploaderMeta):
             _external=external
         )
 
+    def exists(self, lookup: str) -> bool:
+        """Returns true if the file with the given lookup exists."""
+        return self._storage.exists(lookup)
+
     def load(self, lookup: str) -> File:
         """Reads and returns a ``File`` object for an identifier."""
         return self._storage.load(lookup)
 
+    def offload(self, lookup: str) -> t.Optional[Response]:
+        """
+        Returns a response that delegates sending the file
+        to the web server or to the storage,
+        or ``None`` if the storage does not support it.
+        """
+        return self._storage.offload(lookup)
+
     def remove(self, lookup: str) -> None:
         """Deletes a file from storage by unique identifier."""
         self._storage.remove(lookup)
 
+    def remove_many(self, lookups: t.Iterable[str]) -> t.List[BatchResult]:
+        """
+        Deletes files from storage and returns the results
+        in the order of the identifiers.
+        """
+        return self._storage.remove_many(lookups)
+
     def save(
         self,
         storage: FileStorage,
@@ -182,11 +279,85 @@ class Uploader(metaclass=UploaderMeta):
             self.validate(storage)
         return self._storage.save(storage, overwrite=overwrite)
 
+    def save_many(
+        self,
+        storages: t.Iterable[FileStorage],
+        overwrite: bool = False,
+        skip_validation: bool = False,
+        max_workers: int = 8,
+    ) -> t.List[BatchResult]:
+        """
+        Saves the uploaded files and returns the results
+        in the order of the files.
+
+        All files are validated first, then the valid ones are saved
+        concurrently, so remote storages wait for the round trips
+        of the files at the same time.
+        The threads run in the context of the caller
+        and share its application context and storage clients.
+        A file that fails validation or saving is not saved,
+        the exception is returned in its result.
+
+        Arguments:
+            storages (t.Iterable[FileStorage]):
+                Objects to represent uploaded files.
+            overwrite (bool):
+                Overwrite existing files. Default to ``False``.
+            skip_validation (bool):
+                Do not validate the uploaded files. Default to ``False``.
+            max_workers (int):
+                The maximum number of files saved at the same time.
+                Default to ``8``.
+        """
+        storages = list(storages)
+        errors: t.List[t.Optional[Exception]] = [None] * len(storages)
+
+        if not skip_validation:
+            for i, storage in enumerate(storages):
+                try:
+                    self.validate(storage)
+                except Exception as err:
+                    errors[i] = err
+
+        # A new application context for each thread would create
+        # its own clients, a copy of the caller's context reuses them
+        context = contextvars.copy_context()
+
+        def save(storage: FileStorage) -> BatchResult:
+            try:
+                lookup = context.copy().run(
+                    self._storage.save, storage, overwrite=overwrite
+                )
+                return BatchResult(lookup)
+            except Exception as err:
+                return BatchResult(None, err)
+
+        valid = [s for s, err in zip(storages, errors) if err is None]
+        workers = max(1, min(max_workers, len(valid)))
+
+        with ThreadPoolExecutor(workers) as executor:
+            saved = iter(list(executor.map(save, valid)))
+
+        return [
+            next(saved) if err is None else BatchResult(None, err)
+            for err in errors
+        ]
+
+    def stat(self, lookup: str) -> FileStat:
+        """Returns the metadata of the file without reading it."""
+        return self._storage.stat(lookup)
+
     def validate(self, storage: FileStorage) -> None:
         """
         Validates the uploaded file and throws a
         :py:class`~flask_uploader.exceptions.ValidationError`
         exception if an error appears.
+
+        Before running the validators, the file is inspected in one pass,
+        including the hash sum required by the filename strategy.
         """
+        if self.validators:
+            inspect_upload(storage, self._storage.digest_algorithm)
+
         for validator in self.validators:
             validator(storage)
@@ -0,0 +1,350 @@
+from __future__ import annotations
+from datetime import datetime, timezone
+import itertools
+import os
+import sqlite3
+import threading
+import typing as t
+
+from .storages import FileStat
+
+
+__all__ = ('SQLiteIndex',)
+
+
+_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS files (
+        lookup TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime REAL NOT NULL,
+        digest TEXT,
+        mimetype TEXT,
+        original_filename TEXT,
+        generation INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS meta (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    ) WITHOUT ROWID
+    ''',
+    "INSERT OR IGNORE INTO meta VALUES ('generation', 0)",
+    'CREATE INDEX IF NOT EXISTS files_mimetype ON files (mimetype, mtime)',
+    'CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime)',
+)
+
+_COLUMNS = 'lookup, size, mtime, digest, mimetype, original_filename'
+
+# Lookups are ordered by path components, as the file system listing,
+# the separator is replaced with the smallest character for that.
+_PATH_KEY = "replace(lookup, '%s', char(0))" % os.sep.replace("'", "''")
+
+
+def _path_key(lookup: str) -> str:
+    """Returns the value of ``_PATH_KEY`` for the lookup."""
+    return lookup.replace(os.sep, '\x00')
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    """Returns the smallest string greater than all strings with the prefix."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _to_stat(row: t.Tuple[t.Any, ...]) -> FileStat:
+    lookup, size, mtime, digest, mimetype, original_filename = row
+    return FileStat(
+        lookup=lookup,
+        size=size,
+        mtime=datetime.fromtimestamp(mtime, timezone.utc),
+        digest=digest,
+        mimetype=mimetype,
+        original_filename=original_filename,
+    )
+
+
+class SQLiteIndex:
+    """
+    The file metadata index stored in a local SQLite database.
+
+    Answers listing, counting and search queries without walking
+    the file system. Each thread uses its own connection,
+    the database is opened in WAL mode,
+    so several processes can use the same index.
+    """
+
+    __slots__ = ('path', 'timeout', '_local')
+
+    def __init__(self, path: str, timeout: float = 30.0) -> None:
+        """
+        Arguments:
+            path (str):
+                The path to the database file.
+            timeout (float):
+                How many seconds to wait for a lock held by another process.
+                Default to ``30``.
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __repr__(self) -> str:
+        return '<{} path={!r}>'.format(self.__class__.__name__, self.path)
+
+    def _execute(
+        self,
+        sql: str,
+        params: t.Sequence[t.Any] = (),
+    ) -> sqlite3.Cursor:
+        return self.connection.execute(sql, params)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Returns the database connection of the current thread."""
+        conn = getattr(self._local, 'connection', None)
+
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            for sql in _SCHEMA:
+                conn.execute(sql)
+            self._migrate(conn)
+            self._local.connection = conn
+
+        return t.cast(sqlite3.Connection, conn)
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        """Updates an index created by an earlier version."""
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(files)')]
+
+        if 'generation' not in columns:
+            try:
+                conn.execute(
+                    'ALTER TABLE files '
+                    'ADD COLUMN generation INTEGER NOT NULL DEFAULT 0'
+                )
+            except sqlite3.OperationalError:
+                # The column has been added by another connection
+                pass
+
+        conn.execute(
+            f'CREATE INDEX IF NOT EXISTS files_path ON files ({_PATH_KEY})'
+        )
+
+    def add(self, stat: FileStat) -> None:
+        """
+        Adds or replaces the metadata of the file
+        with the current generation of the index.
+        """
+        self._execute(
+            f'INSERT OR REPLACE INTO files ({_COLUMNS}, generation) '
+            'VALUES (?, ?, ?, ?, ?, ?, '
+            "(SELECT value FROM meta WHERE name = 'generation'))",
+            (
+                stat.lookup,
+                stat.size,
+                stat.mtime.timestamp(),
+                stat.digest,
+                stat.mimetype,
+                stat.original_filename,
+            ),
+        )
+
+    def add_many(
+        self,
+        stats: t.Iterable[FileStat],
+        replace_all: bool = False,
+        batch_size: int = 1000,
+        check: t.Optional[t.Callable[[FileStat], bool]] = None,
+    ) -> int:
+        """
+        Adds or replaces the metadata of many files
+        and returns the number of files.
+
+        The entries are written in transactions of ``batch_size`` files,
+        the next batch is taken from the iterable outside the transaction,
+        so a slow iterable does not hold the write lock.
+
+        With ``replace_all``, the call starts a new generation of the index,
+        all entries are written with it, and at the end the entries
+        of older generations, which were neither listed nor saved
+        by ``add`` during the call, are removed.
+
+        Arguments:
+            stats (t.Iterable[FileStat]):
+                The metadata of files.
+            replace_all (bool):
+                Remove the entries of other files,
+                except those added concurrently. Default to ``False``.
+            batch_size (int):
+                The number of files written in one transaction.
+                Default to ``1000``.
+            check (callable):
+                Called for each entry in the write transaction,
+                entries for which it returns false are skipped,
+                for example files removed after they were listed.
+        """
+        conn = self.connection
+        stats = iter(stats)
+        count = 0
+        generation = None
+
+        if replace_all:
+            with conn:
+                conn.execute('BEGIN')
+                conn.execute(
+                    "UPDATE meta SET value = value + 1 "
+                    "WHERE name = 'generation'"
+                )
+                generation = conn.execute(
+                    "SELECT value FROM meta WHERE name = 'generation'"
+                ).fetchone()[0]
+
+        while True:
+            batch = list(itertools.islice(stats, batch_size))
+
+            if not batch:
+                break
+
+            with conn:
+                conn.execute('BEGIN')
+                for stat in batch:
+                    if check is None or check(stat):
+                        self.add(stat)
+                        count += 1
+
+        if generation is not None:
+            self._execute(
+                'DELETE FROM files WHERE generation < ?', (generation,)
+            )
+
+        return count
+
+    def clear(self) -> None:
+        """Removes all entries."""
+        self._execute('DELETE FROM files')
+
+    def count(self, prefix: str = '') -> int:
+        """Returns the number of files whose lookup starts with the prefix."""
+        where, params = self._where_prefix(prefix)
+        row = self._execute(
+            f'SELECT COUNT(*) FROM files {where}', params
+        ).fetchone()
+        return int(row[0])
+
+    def find(
+        self,
+        mimetype: t.Optional[str] = None,
+        modified_after: t.Optional[datetime] = None,
+        modified_before: t.Optional[datetime] = None,
+        limit: int = 1000,
+    ) -> t.List[FileStat]:
+        """
+        Returns the files with the given mimetype
+        and modified in the given period, newest first.
+        """
+        conditions = []
+        params: t.List[t.Any] = []
+
+        if mimetype is not None:
+            conditions.append('mimetype = ?')
+            params.append(mimetype)
+
+        if modified_after is not None:
+            conditions.append('mtime >= ?')
+            params.append(modified_after.timestamp())
+
+        if modified_before is not None:
+            conditions.append('mtime < ?')
+            params.append(modified_before.timestamp())
+
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        params.append(limit)
+
+        return [
+            _to_stat(row) for row in self._execute(
+                f'SELECT {_COLUMNS} FROM files {where} '
+                'ORDER BY mtime DESC LIMIT ?',
+                params,
+            )
+        ]
+
+    def get(self, lookup: str) -> t.Optional[FileStat]:
+        """Returns the metadata of the file or ``None``."""
+        row = self._execute(
+            f'SELECT {_COLUMNS} FROM files WHERE lookup = ?', (lookup,)
+        ).fetchone()
+        return None if row is None else _to_stat(row)
+
+    def list(
+        self,
+        prefix: str = '',
+        limit: int = 1000,
+        cursor: t.Optional[str] = None,
+    ) -> t.List[FileStat]:
+        """
+        Returns the files whose lookup starts with the prefix
+        in the order of path components, as ``os.scandir`` listings,
+        starting after the cursor.
+        """
+        conditions = []
+        params: t.List[t.Any] = []
+
+        if prefix:
+            key = _path_key(prefix)
+            conditions.append(f'{_PATH_KEY} >= ? AND {_PATH_KEY} < ?')
+            params.extend((key, _prefix_upper_bound(key)))
+
+        if cursor is not None:
+            conditions.append(f'{_PATH_KEY} > ?')
+            params.append(_path_key(cursor))
+
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        params.append(limit)
+
+        return [
+            _to_stat(row) for row in self._execute(
+                f'SELECT {_COLUMNS} FROM files {where} '
+                f'ORDER BY {_PATH_KEY} LIMIT ?',
+                params,
+            )
+        ]
+
+    def remove(self, lookup: str) -> None:
+        """Removes the metadata of the file."""
+        self._execute('DELETE FROM files WHERE lookup = ?', (lookup,))
+
+    def remove_many(self, lookups: t.Iterable[str]) -> None:
+        """Removes the metadata of many files in one transaction."""
+        with self.connection as conn:
+            conn.execute('BEGIN')
+            conn.executemany(
+                'DELETE FROM files WHERE lookup = ?',
+                ((lookup,) for lookup in lookups),
+            )
+
+    def total_size(self, prefix: str = '') -> int:
+        """
+        Returns the total size of files whose lookup starts with the prefix.
+        """
+        where, params = self._where_prefix(prefix)
+        row = self._execute(
+            f'SELECT TOTAL(size) FROM files {where}', params
+        ).fetchone()
+        return int(row[0])
+
+    def _where_prefix(self, prefix: str) -> t.Tuple[str, t.List[t.Any]]:
+        """
+        Returns a condition on the lookup prefix that uses the primary key.
+        """
+        if not prefix:
+            return '', []
+        return (
+            'WHERE lookup >= ? AND lookup < ?',
+            [prefix, _prefix_upper_bound(prefix)],
+        )
@@ -0,0 +1,270 @@
+from __future__ import annotations
+import io
+import os
+import typing as t
+import weakref
+
+from PIL import Image, UnidentifiedImageError
+
+from .utils import iter_chunks, new_hash
+
+if t.TYPE_CHECKING:
+    from werkzeug.datastructures import FileStorage
+
+    Cache = weakref.WeakKeyDictionary[
+        FileStorage, t.Tuple[t.Any, 'UploadInfo']
+    ]
+
+
+__all__ = (
+    'get_upload_info',
+    'HashingStream',
+    'inspect_upload',
+    'UploadInfo',
+)
+
+
+HEADER_SIZE = 65536
+
+# Formats whose dimensions may be stored far from the beginning of the file,
+# for example after a large EXIF block in JPEG.
+_LONG_HEADER_SIGNATURES = (
+    b'\xff\xd8\xff',  # JPEG
+    b'II*\x00',  # TIFF little-endian
+    b'MM\x00*',  # TIFF big-endian
+)
+
+
+class UploadInfo(t.NamedTuple):
+    """
+    The result of inspecting the uploaded file.
+
+    Computed once per upload and shared by validators and filename strategies,
+    so the stream is not read by each of them separately.
+    """
+    size: int
+    header: bytes
+    digest: t.Optional[str] = None
+    algorithm: t.Optional[str] = None
+    image_format: t.Optional[str] = None
+    image_size: t.Optional[t.Tuple[int, int]] = None
+
+
+_cache: Cache = weakref.WeakKeyDictionary()
+
+
+class HashingStream:
+    """
+    A wrapper over a writable file that calculates the hash sum,
+    the size and the leading bytes of the data while it is being written.
+
+    Used as a container for uploaded files in the multipart parser,
+    so the digest is ready by the time the request body is received.
+    Any write after a seek or truncate invalidates the result,
+    in which case the upload is inspected as usual.
+    """
+
+    def __init__(
+        self,
+        stream: t.BinaryIO,
+        algorithm: str = 'md5',
+        header_size: int = HEADER_SIZE,
+    ) -> None:
+        """
+        Arguments:
+            stream (t.BinaryIO):
+                The file to which the received data is written.
+            algorithm (str):
+                The name of the hash algorithm. Default to ``md5``.
+            header_size (int):
+                The number of leading bytes to keep. Default to 64Kb.
+        """
+        self._stream = stream
+        self._hash: t.Optional[t.Any] = new_hash(algorithm)
+        self._header = bytearray()
+        self._header_size = header_size
+        self._size = 0
+        self._finished = False
+        self.algorithm = algorithm
+
+    def __getattr__(self, name: str) -> t.Any:
+        return getattr(self._stream, name)
+
+    def __iter__(self) -> t.Iterator[bytes]:
+        return iter(self._stream)
+
+    def __enter__(self) -> HashingStream:
+        return self
+
+    def __exit__(self, *args: t.Any) -> None:
+        self.close()
+
+    def get_info(self) -> t.Optional[UploadInfo]:
+        """
+        Returns the result of the inspection made while receiving,
+        or ``None`` if the data has not been written sequentially.
+        """
+        if self._hash is None or not self._finished:
+            return None
+        return UploadInfo(
+            size=self._size,
+            header=bytes(self._header),
+            digest=self._hash.hexdigest(),
+            algorithm=self.algorithm,
+        )
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        self._finished = True
+        return self._stream.seek(offset, whence)
+
+    def truncate(self, size: t.Optional[int] = None) -> int:
+        self._hash = None
+        return self._stream.truncate(size)
+
+    def write(self, data: bytes) -> int:
+        if self._finished:
+            self._hash = None
+        elif self._hash is not None:
+            self._hash.update(data)
+            self._size += len(data)
+            if len(self._header) < self._header_size:
+                self._header += data[:self._header_size - len(self._header)]
+        return self._stream.write(data)
+
+
+def _identify_image(
+    header: bytes,
+    stream: t.BinaryIO,
+    size: int,
+) -> t.Tuple[t.Optional[str], t.Optional[t.Tuple[int, int]]]:
+    """
+    Returns the format and size of the image in pixels
+    or a pair of ``None`` if the file is not an image.
+
+    The leading bytes are enough for most formats.
+    Only if the header of JPEG or TIFF is incomplete,
+    the image is opened directly from the stream.
+    """
+    try:
+        with Image.open(io.BytesIO(header)) as image:
+            return image.format, image.size
+    except UnidentifiedImageError:
+        if (
+            len(header) >= size
+            or not header.startswith(_LONG_HEADER_SIGNATURES)
+        ):
+            return None, None
+
+    stream.seek(0)
+
+    try:
+        with Image.open(stream) as image:
+            return image.format, image.size
+    except UnidentifiedImageError:
+        return None, None
+    finally:
+        stream.seek(0)
+
+
+def get_upload_info(storage: FileStorage) -> t.Optional[UploadInfo]:
+    """
+    Returns the result of a previous inspection of the uploaded file
+    without reading the stream, or ``None``.
+    """
+    cached = _cache.get(storage)
+
+    if cached is not None and cached[0] is storage.stream:
+        return cached[1]
+
+    return None
+
+
+def inspect_upload(
+    storage: FileStorage,
+    algorithm: t.Optional[str] = None,
+    buffer_size: t.Optional[int] = None,
+    header_size: int = HEADER_SIZE,
+) -> UploadInfo:
+    """
+    Inspects the uploaded file and returns an ``UploadInfo`` object.
+
+    The result is cached for the lifetime of the ``FileStorage`` object,
+    repeated calls do not touch the stream.
+
+    Arguments:
+        storage (FileStorage):
+            Object to represent uploaded file.
+        algorithm (str):
+            The name of the hash algorithm,
+            see :py:func:`~flask_uploader.utils.new_hash`.
+            If given, the whole stream is read once
+            and the digest is calculated along with the other fields,
+            otherwise only the leading bytes are read.
+        buffer_size (int):
+            The number of bytes held in memory during the read.
+            By default, adapts to the size of the stream.
+        header_size (int):
+            The number of leading bytes to keep. Default to 64Kb.
+    """
+    stream = t.cast(t.BinaryIO, storage.stream)
+    cached = _cache.get(storage)
+    info: t.Optional[UploadInfo] = None
+
+    if cached is not None and cached[0] is stream:
+        info = cached[1]
+        if algorithm is None or info.algorithm == algorithm:
+            return info
+
+    if info is None and isinstance(stream, HashingStream):
+        received = stream.get_info()
+        if received is not None and algorithm in (None, received.algorithm):
+            image_format, image_size = _identify_image(
+                received.header, stream, received.size
+            )
+            info = received._replace(
+                image_format=image_format,
+                image_size=image_size,
+            )
+            _cache[storage] = (stream, info)
+            return info
+
+    stream.seek(0)
+
+    if algorithm is None:
+        header = stream.read(header_size)
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        digest = None
+    else:
+        hash_obj = new_hash(algorithm)
+        parts: t.List[bytes] = []
+        header_len = size = 0
+
+        for chunk in iter_chunks(stream, buffer_size):
+            hash_obj.update(chunk)
+            size += len(chunk)
+            if header_len < header_size:
+                parts.append(bytes(chunk[:header_size - header_len]))
+                header_len += len(parts[-1])
+
+        header = b''.join(parts)
+        digest = hash_obj.hexdigest()
+
+    if info is None:
+        image_format, image_size = _identify_image(header, stream, size)
+    else:
+        image_format, image_size = info.image_format, info.image_size
+
+    stream.seek(0)
+
+    info = UploadInfo(
+        size=size,
+        header=header,
+        digest=digest,
+        algorithm=algorithm,
+        image_format=image_format,
+        image_size=image_size,
+    )
+    _cache[storage] = (stream, info)
+
+    return info
@@ -1,10 +1,18 @@
 from __future__ import annotations
 from abc import ABCMeta, abstractmethod
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import bisect
+import itertools
+import logging
 import pathlib
 import os
 import re
+import sqlite3
 import typing as t
+from urllib.parse import quote
+import uuid
+import weakref
 
 from flask import current_app
 from werkzeug.datastructures import FileStorage
@@ -15,27 +23,131 @@ from .exceptions import (
     PermissionDenied,
 )
 from .formats import guess_type
-from .utils import get_extension, md5stream, split_pairs
+from .inspection import get_upload_info, inspect_upload
+from .utils import (
+    LRUCache,
+    copy_stream,
+    fsync_dir,
+    get_extension,
+    get_content_disposition,
+    get_file_path,
+    get_fileno,
+    get_umask,
+    hash_file,
+    split_pairs,
+)
+from .wrappers import is_upload_temp_file
 
 if t.TYPE_CHECKING:
+    from flask import Flask
+    from werkzeug.wrappers import Response
+    from .index import SQLiteIndex
     from .typing import FilenameStrategyCallable
 
 
 __all__ = (
     'AbstractStorage',
+    'BatchResult',
     'File',
+    'FileStat',
     'FileSystemStorage',
     'HashedFilenameStrategy',
+    'Page',
+    'PresignedPost',
     'TimestampStrategy',
 )
 
 
+logger = logging.getLogger(__name__)
+
+_LOOKUP_PREFIX_RE = re.compile(r'^[./\\]+')
+_LOOKUP_SEP_RE = re.compile(r'[/\\]+')
+
+
+class BatchResult(t.NamedTuple):
+    """
+    The result of an operation on one file of a batch.
+
+    The error is ``None`` if the operation succeeded.
+    """
+    lookup: t.Optional[str]
+    error: t.Optional[Exception] = None
+
+
 class File(t.NamedTuple):
     """The result of reading a file from the selected storage."""
     path_or_file: t.Union[str, t.BinaryIO]
     lookup: t.Optional[str] = None
     filename: t.Optional[str] = None
     mimetype: t.Optional[str] = None
+    size: t.Optional[int] = None
+    last_modified: t.Optional[datetime] = None
+    etag: t.Optional[str] = None
+
+
+class FileStat(t.NamedTuple):
+    """File metadata that can be obtained without reading the file."""
+    lookup: str
+    size: int
+    mtime: datetime
+    digest: t.Optional[str] = None
+    mimetype: t.Optional[str] = None
+    original_filename: t.Optional[str] = None
+    etag: t.Optional[str] = None
+
+
+class Page(t.NamedTuple):
+    """
+    A page of the file listing.
+
+    Pass the cursor to get the next page,
+    it is ``None`` if this is the last page.
+    """
+    files: t.List[File]
+    cursor: t.Optional[str] = None
+
+
+class PresignedPost(t.NamedTuple):
+    """
+    The parameters of an HTML form for uploading a file
+    directly to the storage, bypassing the application.
+    """
+    url: str
+    fields: t.Dict[str, str]
+    lookup: str
+
+
+class _DirListing(t.NamedTuple):
+    """A sorted snapshot of the directory entries."""
+    mtime_ns: int
+    names: t.List[str]
+    dirs: t.FrozenSet[str]
+
+
+def _scan_dir(path: str) -> t.Optional[_DirListing]:
+    """
+    Returns the directory entries sorted by name,
+    or ``None`` if the directory does not exist.
+
+    Hidden entries, including temporary files, are skipped.
+    """
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+        names = []
+        dirs = set()
+
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name.startswith('.'):
+                    continue
+                names.append(entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.add(entry.name)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+    names.sort()
+    return _DirListing(mtime_ns, names, frozenset(dirs))
 
 
 class HashedFilenameStrategy:
@@ -50,35 +162,68 @@ class HashedFilenameStrategy:
 
     Thanks to the hash and partitioning,
     files are evenly stored across directories.
+
+    The hash is taken from the upload inspection,
+    so the stream is read only once
+    even if the validators have already looked at the file.
     """
 
-    __slots__ = ('buffer_size', 'step', 'max_split')
+    __slots__ = ('algorithm', 'buffer_size', 'step', 'max_split')
 
     def __init__(
         self,
-        buffer_size: int = 16384,
+        buffer_size: t.Optional[int] = None,
         step: int = 2,
         max_split: int = 3,
+        algorithm: str = 'md5',
     ) -> None:
         """
         Arguments:
             buffer_size (int):
                 The buffer size is the number of bytes
                 held in memory during the hash process.
-                Default to 16Kb.
+                By default, adapts to the size of the file.
             step (int): cutting step. Default to ``2``.
             max_split (int): Maximum number of splits to do. Default to ``3``.
+            algorithm (str):
+                The name of the hash algorithm, for example
+                ``md5``, ``sha256``, ``blake2b`` or ``xxh3_128``,
+                see :py:func:`~flask_uploader.utils.new_hash`.
+                Default to ``md5``.
         """
+        self.algorithm = algorithm
         self.buffer_size = buffer_size
         self.step = step
         self.max_split = max_split
 
+    def iter_dirs(self) -> t.Iterator[str]:
+        """
+        Returns an iterator over all directories
+        that the strategy can generate, parents first.
+        """
+        if self.max_split < 1:
+            raise ValueError(
+                'The list of directories is not limited without max_split.'
+            )
+
+        names = [
+            '%0*x' % (self.step, i) for i in range(16 ** self.step)
+        ]
+
+        def walk(parent: str, depth: int) -> t.Iterator[str]:
+            for name in names:
+                path = os.path.join(parent, name)
+                yield path
+                if depth > 1:
+                    yield from walk(path, depth - 1)
+
+        if self.max_split > 1:
+            yield from walk('', self.max_split - 1)
+
     def __call__(self, storage: FileStorage) -> str:
+        info = inspect_upload(storage, self.algorithm, self.buffer_size)
         return os.path.join(*split_pairs(
-            md5stream(
-                t.cast(t.BinaryIO, storage.stream),
-                self.buffer_size,
-            ),
+            t.cast(str, info.digest),
             step=self.step,
             max_split=self.max_split,
         ))
@@ -113,6 +258,11 @@ class TimestampStrategy:
         return now.strftime(self.fmt)
 
 
+def _make_etag(size: int, mtime: datetime) -> str:
+    """Returns the entity tag of a file on disk."""
+    return '%x-%x' % (int(mtime.timestamp()), size)
+
+
 class AbstractStorage(metaclass=ABCMeta):
     """A file storage that provides basic file operations."""
 
@@ -131,6 +281,40 @@ class AbstractStorage(metaclass=ABCMeta):
             filename_strategy = HashedFilenameStrategy()
         self.filename_strategy = filename_strategy
 
+    @property
+    def digest_algorithm(self) -> t.Optional[str]:
+        """
+        Returns the name of the hash algorithm used by the filename strategy,
+        or ``None`` if the strategy does not hash the contents of the file.
+        """
+        return getattr(self.filename_strategy, 'algorithm', None)
+
+    def exists(self, lookup: str) -> bool:
+        """
+        Returns true if the file with the given lookup exists.
+
+        Arguments:
+            lookup (str):
+                The unique identifier for the file in the selected storage.
+        """
+        try:
+            self.stat(lookup)
+            return True
+        except NotImplementedError:
+            pass
+        except FileNotFound:
+            return False
+
+        try:
+            f = self.load(lookup)
+        except FileNotFound:
+            return False
+
+        if not isinstance(f.path_or_file, str):
+            f.path_or_file.close()
+
+        return True
+
     def generate_filename(self, storage: FileStorage) -> str:
         """Returns the name of the file to save."""
         filename = self.filename_strategy(storage)
@@ -159,38 +343,573 @@ class AbstractStorage(metaclass=ABCMeta):
         """
         return None
 
+    def commit_presigned_post(
+        self,
+        lookup: str,
+        content_type: t.Optional[str] = None,
+        min_size: int = 0,
+        max_size: t.Optional[int] = None,
+    ) -> str:
+        """
+        Checks the file uploaded directly to the storage
+        and returns an identifier for searching.
+
+        A file that does not satisfy the conditions is removed
+        and a :py:class:`~flask_uploader.exceptions.ValidationError`
+        exception is raised.
+
+        Arguments:
+            lookup (str):
+                The identifier returned by :py:meth:`generate_presigned_post`.
+            content_type (str):
+                The expected MIME type of the file.
+            min_size (int):
+                The minimum file size in bytes.
+            max_size (int):
+                The maximum file size in bytes.
+        """
+        raise NotImplementedError(
+            f'{self.__class__.__name__} does not support direct uploads.'
+        )
+
+    def generate_presigned_post(
+        self,
+        filename: str,
+        content_type: t.Optional[str] = None,
+        min_size: int = 0,
+        max_size: t.Optional[int] = None,
+    ) -> PresignedPost:
+        """
+        Returns the parameters of a form for uploading a file
+        directly to the storage.
+
+        Arguments:
+            filename (str):
+                The original name of the file, only the extension is used.
+            content_type (str):
+                The MIME type the client must send.
+            min_size (int):
+                The minimum file size in bytes.
+            max_size (int):
+                The maximum file size in bytes.
+        """
+        raise NotImplementedError(
+            f'{self.__class__.__name__} does not support direct uploads.'
+        )
+
     @abstractmethod
     def load(self, lookup: str) -> File:
         """Reads and returns a ``File`` object for an identifier."""
 
+    def offload(self, lookup: str) -> t.Optional[Response]:
+        """
+        Returns a response that delegates sending the file
+        to the web server or to the storage itself,
+        or ``None`` if the file must be sent by the application.
+
+        Arguments:
+            lookup (str):
+                The unique identifier for the file in the selected storage.
+        """
+        return None
+
     @abstractmethod
     def remove(self, lookup: str) -> None:
         """Deletes a file from storage by unique identifier."""
 
+    def remove_many(self, lookups: t.Iterable[str]) -> t.List[BatchResult]:
+        """
+        Deletes files from storage and returns the results
+        in the order of the identifiers.
+
+        Storages override this method to delete files in bulk,
+        by default the files are deleted one by one.
+
+        Arguments:
+            lookups (t.Iterable[str]):
+                The unique identifiers of the files in the selected storage.
+        """
+        results = []
+
+        for lookup in lookups:
+            try:
+                self.remove(lookup)
+                results.append(BatchResult(lookup))
+            except Exception as err:
+                results.append(BatchResult(lookup, err))
+
+        return results
+
     @abstractmethod
     def save(self, storage: FileStorage, overwrite: bool = False) -> str:
         """Saves the uploaded file and returns an identifier for searching."""
 
+    def stat(self, lookup: str) -> FileStat:
+        """
+        Returns the metadata of the file without reading it
+        or throws a :py:class:`~flask_uploader.exceptions.FileNotFound`
+        exception.
+
+        Arguments:
+            lookup (str):
+                The unique identifier for the file in the selected storage.
+        """
+        raise NotImplementedError(
+            f'{self.__class__.__name__} does not support reading metadata.'
+        )
+
 
 class FileSystemStorage(AbstractStorage):
-    """Local file storage on the HDD."""
+    """
+    Local file storage on the HDD.
 
-    __slots__ = ('dest',)
+    Files are written to a temporary file in the destination directory
+    and atomically renamed, so a partially written file is never visible.
+    """
+
+    __slots__ = (
+        'dest',
+        'fsync',
+        'index_path',
+        'offload_header',
+        'offload_prefix',
+        '_app_root_dirs',
+        '_dir_listings',
+        '_indexes',
+        '_known_dirs',
+        '_last_indexes',
+        '_root_dir',
+    )
+
+    FSYNC_NONE = 'none'
+    FSYNC_FILE = 'file'
+    FSYNC_FULL = 'full'
+
+    OFFLOAD_ACCEL_REDIRECT = 'X-Accel-Redirect'
+    OFFLOAD_SENDFILE = 'X-Sendfile'
+
+    #: The number of threads that delete files in :py:meth:`remove_many`.
+    REMOVE_WORKERS = 8
+
+    #: The number of directory snapshots kept for :py:meth:`list_files`.
+    LISTING_CACHE_SIZE = 64
 
     def __init__(
         self,
         dest: str,
         filename_strategy: t.Optional[FilenameStrategyCallable] = None,
+        fsync: str = FSYNC_NONE,
+        index_path: t.Optional[str] = None,
+        offload_header: t.Optional[str] = None,
+        offload_prefix: str = '/',
     ) -> None:
+        """
+        Arguments:
+            dest (str):
+                The path to the directory for saving uploaded files.
+            filename_strategy (FilenameStrategyCallable):
+                A callable that returns the name of the file to save.
+            fsync (str):
+                When to flush the saved file to disk:
+                ``none`` - leave it to the OS,
+                ``file`` - flush the contents before the rename,
+                ``full`` - also flush the directory after the rename.
+                Default to ``none``.
+            index_path (str):
+                The path to the SQLite database with the metadata index,
+                relative to the root directory or absolute.
+                The index is kept up to date by ``save`` and ``remove``
+                and answers ``list_files``, ``stat`` and ``exists``
+                without touching the file system;
+                ``stat`` and ``exists`` check the disk for files
+                that are not indexed yet.
+                Use a hidden name such as ``.index.sqlite3``,
+                so the database is not listed as an uploaded file.
+                Disabled by default.
+            offload_header (str):
+                The header that passes sending the file to the web server:
+                ``X-Accel-Redirect`` - the lookup is mapped
+                to an internal nginx location with ``offload_prefix``,
+                ``X-Sendfile`` - the absolute path to the file
+                (Apache, lighttpd).
+                Disabled by default.
+            offload_prefix (str):
+                The URI of the internal nginx location
+                that serves the root directory. Default to ``/``.
+        """
+        if fsync not in (self.FSYNC_NONE, self.FSYNC_FILE, self.FSYNC_FULL):
+            raise ValueError(f'Unknown fsync policy: {fsync!r}.')
+
+        if offload_header not in (
+            None, self.OFFLOAD_ACCEL_REDIRECT, self.OFFLOAD_SENDFILE,
+        ):
+            raise ValueError(f'Unknown offload header: {offload_header!r}.')
+
         super().__init__(filename_strategy)
         self.dest = os.path.expandvars(dest)
+        self.fsync = fsync
+        self.index_path = index_path
+        self.offload_header = offload_header
+        self.offload_prefix = offload_prefix.rstrip('/') + '/'
+        self._dir_listings: LRUCache[str, _DirListing] = LRUCache(
+            self.LISTING_CACHE_SIZE
+        )
+        self._indexes: t.Dict[str, SQLiteIndex] = {}
+        self._known_dirs: t.Set[str] = set()
+        self._last_indexes: LRUCache[str, int] = LRUCache()
+        self._root_dir: t.Optional[str] = None
+        self._app_root_dirs: weakref.WeakKeyDictionary[Flask, str] = (
+            weakref.WeakKeyDictionary()
+        )
 
     def _make_filepath(self, lookup: str) -> str:
         """Returns the absolute path to the uploaded file."""
-        lookup = re.sub(r'^[./\\]+', '', lookup)
+        lookup = _LOOKUP_PREFIX_RE.sub('', lookup)
         return os.path.join(self.get_root_dir(), lookup)
 
+    def _make_stat(
+        self,
+        lookup: str,
+        path: str,
+        storage: t.Optional[FileStorage] = None,
+        algorithm: t.Optional[str] = None,
+    ) -> FileStat:
+        """Returns the metadata of the file read from the file system."""
+        st = os.stat(path)
+        digest = None
+        mimetype = guess_type(lookup, use_external=True)
+        original_filename = None
+
+        if storage is not None:
+            info = get_upload_info(storage)
+            digest = info.digest if info is not None else None
+            mimetype = mimetype or storage.mimetype or None
+            original_filename = storage.filename
+
+        if algorithm is not None:
+            digest = hash_file(path, algorithm)
+
+        return FileStat(
+            lookup=lookup,
+            size=st.st_size,
+            mtime=datetime.fromtimestamp(st.st_mtime, timezone.utc),
+            digest=digest,
+            mimetype=mimetype,
+            original_filename=original_filename,
+        )
+
+    def exists(self, lookup: str) -> bool:
+        """Returns true if the file with the given lookup exists."""
+        index = self.get_index()
+        lookup = _LOOKUP_PREFIX_RE.sub('', lookup)
+
+        if index is not None and index.get(lookup) is not None:
+            return True
+
+        return os.path.exists(self._make_filepath(lookup))
+
+    def get_index(self) -> t.Optional[SQLiteIndex]:
+        """
+        Returns the metadata index of the current root directory,
+        or ``None`` if the index is disabled.
+        """
+        if self.index_path is None:
+            return None
+
+        path = os.path.join(self.get_root_dir(), self.index_path)
+        index = self._indexes.get(path)
+
+        if index is None:
+            from .index import SQLiteIndex
+            index = self._indexes.setdefault(path, SQLiteIndex(path))
+
+        return index
+
+    def reindex(self, algorithm: t.Optional[str] = None) -> int:
+        """
+        Rebuilds the metadata index from the files on disk
+        and returns the number of files.
+
+        Arguments:
+            algorithm (str):
+                The name of the hash algorithm to calculate digests,
+                by default digests are not calculated.
+        """
+        index = self.get_index()
+
+        if index is None:
+            raise RuntimeError('The metadata index is disabled.')
+
+        root_dir = self.get_root_dir()
+
+        def iter_stats() -> t.Iterator[FileStat]:
+            for f in self._iter_dir(root_dir, ''):
+                try:
+                    yield self._make_stat(
+                        t.cast(str, f.lookup),
+                        t.cast(str, f.path_or_file),
+                        algorithm=algorithm,
+                    )
+                except FileNotFoundError:
+                    # Removed after it was listed
+                    pass
+
+        def exists(stat: FileStat) -> bool:
+            # Checked in the write transaction, so a file removed
+            # during the scan does not come back: its entry is removed
+            # after it is unlinked, when the transaction is over.
+            return os.path.exists(os.path.join(root_dir, stat.lookup))
+
+        return index.add_many(iter_stats(), replace_all=True, check=exists)
+
+    def stat(self, lookup: str) -> FileStat:
+        """Returns the metadata of the file without reading it."""
+        index = self.get_index()
+        lookup = _LOOKUP_PREFIX_RE.sub('', lookup)
+
+        stat = None if index is None else index.get(lookup)
+
+        if stat is None:
+            # Files copied to the directory are not indexed until reindex
+            try:
+                stat = self._make_stat(lookup, self._make_filepath(lookup))
+            except FileNotFoundError:
+                pass
+
+        if stat is None:
+            raise FileNotFound(f'File with path {lookup!r} not found.')
+
+        return stat._replace(etag=_make_etag(stat.size, stat.mtime))
+
     def get_root_dir(self) -> str:
+        """
+        Returns the root directory for saving uploaded files.
+
+        The directory is resolved, checked and created on first use,
+        then cached for each application.
+        Call :py:meth:`reset_root_dir` if the configuration changes.
+        """
+        if os.path.isabs(self.dest):
+            if self._root_dir is None:
+                self._root_dir = self._resolve_root_dir()
+            return self._root_dir
+
+        app = current_app._get_current_object()  # type: ignore
+        root_dir = self._app_root_dirs.get(app)
+
+        if root_dir is None:
+            root_dir = self._app_root_dirs[app] = self._resolve_root_dir()
+
+        return root_dir
+
+    def _get_dir_listing(self, path: str) -> t.Optional[_DirListing]:
+        """
+        Returns the sorted snapshot of the directory entries.
+
+        The snapshot is reused by the following pages
+        while the modification time of the directory is the same,
+        so a directory is scanned and sorted once per change,
+        not once per page.
+        """
+        listing = self._dir_listings.get(path)
+
+        if listing is not None:
+            try:
+                if os.stat(path).st_mtime_ns == listing.mtime_ns:
+                    return listing
+            except (FileNotFoundError, NotADirectoryError):
+                self._dir_listings.pop(path)
+                return None
+
+        listing = _scan_dir(path)
+
+        if listing is None:
+            self._dir_listings.pop(path)
+        else:
+            self._dir_listings[path] = listing
+
+        return listing
+
+    def _iter_dir(
+        self,
+        path: str,
+        lookup: str,
+        after: t.Sequence[str] = (),
+        name_prefix: str = '',
+    ) -> t.Iterator[File]:
+        """
+        Returns an iterator over the files in the directory and subdirectories
+        in the lexicographic order of the path components,
+        starting after the file with the given path components.
+        """
+        listing = self._get_dir_listing(path)
+
+        if listing is None:
+            return
+
+        start = after[0] if after else None
+        names = listing.names
+        i = bisect.bisect_left(
+            names, name_prefix if start is None else max(start, name_prefix)
+        )
+
+        for name in (names[j] for j in range(i, len(names))):
+            if not name.startswith(name_prefix):
+                break
+
+            entry_lookup = os.path.join(lookup, name)
+            entry_path = os.path.join(path, name)
+
+            if name in listing.dirs:
+                yield from self._iter_dir(
+                    entry_path,
+                    entry_lookup,
+                    after[1:] if name == start else (),
+                )
+            elif name != start:
+                yield File(
+                    lookup=entry_lookup,
+                    path_or_file=entry_path,
+                    filename=name,
+                    mimetype=guess_type(name),
+                )
+
+    def list_files(
+        self,
+        prefix: str = '',
+        limit: int = 1000,
+        cursor: t.Optional[str] = None,
+    ) -> Page:
+        """
+        Returns a page of files in a stable order.
+
+        Directories are read with ``os.scandir``,
+        the sorted entries of the last directories are cached
+        until the directory changes,
+        so reading all pages scans each directory once.
+        Hidden files and directories are not listed.
+        The metadata that requires a system call is not loaded.
+
+        Arguments:
+            prefix (str):
+                Only files whose lookup starts with the prefix.
+            limit (int):
+                The maximum number of files on the page. Default to ``1000``.
+            cursor (str):
+                The cursor of the previous page to continue the listing.
+        """
+        if limit < 1:
+            raise ValueError('The limit must be a positive number.')
+
+        index = self.get_index()
+
+        if index is not None:
+            return self._list_indexed_files(index, prefix, limit, cursor)
+
+        root_dir = self.get_root_dir()
+        dir_prefix, name_prefix = os.path.split(
+            _LOOKUP_PREFIX_RE.sub('', prefix)
+        )
+        base = tuple(_LOOKUP_SEP_RE.split(dir_prefix)) if dir_prefix else ()
+        after = tuple(_LOOKUP_SEP_RE.split(cursor)) if cursor else ()
+
+        if after[:len(base)] == base:
+            after = after[len(base):]
+        elif after > base:
+            return Page([])
+        else:
+            after = ()
+
+        files = list(itertools.islice(
+            self._iter_dir(
+                os.path.join(root_dir, dir_prefix),
+                dir_prefix,
+                after,
+                name_prefix,
+            ),
+            limit + 1,
+        ))
+
+        if len(files) > limit:
+            return Page(files[:limit], files[limit - 1].lookup)
+
+        return Page(files)
+
+    def _list_indexed_files(
+        self,
+        index: SQLiteIndex,
+        prefix: str,
+        limit: int,
+        cursor: t.Optional[str],
+    ) -> Page:
+        """Returns a page of files from the metadata index."""
+        root_dir = self.get_root_dir()
+        stats = index.list(
+            _LOOKUP_PREFIX_RE.sub('', prefix), limit + 1, cursor
+        )
+        files = [
+            File(
+                lookup=stat.lookup,
+                path_or_file=os.path.join(root_dir, stat.lookup),
+                filename=os.path.basename(stat.lookup),
+                mimetype=stat.mimetype,
+            )
+            for stat in stats[:limit]
+        ]
+
+        if len(stats) > limit:
+            return Page(files, files[-1].lookup)
+
+        return Page(files)
+
+    def make_dirs(self) -> int:
+        """
+        Creates the full tree of directories
+        that the filename strategy can generate
+        and returns the number of directories.
+
+        Saves a ``makedirs`` call per upload,
+        which matters on network file systems.
+        The strategy must have the ``iter_dirs`` method,
+        like :py:class:`HashedFilenameStrategy`.
+        """
+        iter_dirs = getattr(self.filename_strategy, 'iter_dirs', None)
+
+        if iter_dirs is None:
+            raise TypeError(
+                'The filename strategy does not provide a list of directories.'
+            )
+
+        root_dir = self.get_root_dir()
+        count = 0
+
+        for dirname in iter_dirs():
+            self._ensure_dir(os.path.join(root_dir, dirname))
+            count += 1
+
+        return count
+
+    def reset_root_dir(self) -> None:
+        """
+        Resets the cached root directory
+        and the directories known to exist,
+        they will be checked again on the next call.
+        """
+        self._indexes.clear()
+        self._root_dir = None
+        self._app_root_dirs.clear()
+        self._dir_listings.clear()
+        self._known_dirs.clear()
+
+    def _ensure_dir(self, dirname: str) -> None:
+        """
+        Creates the directory if it is not already known to exist.
+        """
+        if dirname not in self._known_dirs:
+            os.makedirs(dirname, exist_ok=True)
+            self._known_dirs.add(dirname)
+
+    def _resolve_root_dir(self) -> str:
         """Returns the root directory for saving uploaded files."""
         root_dir = pathlib.Path(self.dest)
 
@@ -215,34 +934,116 @@ class FileSystemStorage(AbstractStorage):
 
         root_dir /= self.dest
 
-        if not root_dir.exists():
-            root_dir.mkdir(0o755, parents=True)
+        # Concurrent saves may create the directory at the same time
+        root_dir.mkdir(0o755, parents=True, exist_ok=True)
 
         return root_dir.as_posix()
 
     def load(self, lookup: str) -> File:
         path = self._make_filepath(lookup)
 
-        if not os.path.exists(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
             raise FileNotFound(f'File with path {lookup!r} not found.')
 
+        mtime = datetime.fromtimestamp(st.st_mtime, timezone.utc)
+
         return File(
             lookup=lookup,
             path_or_file=path,
             filename=os.path.basename(lookup),
-            mimetype=guess_type(lookup)
+            mimetype=guess_type(lookup),
+            size=st.st_size,
+            last_modified=mtime,
+            etag=_make_etag(st.st_size, mtime),
         )
 
+    def offload(self, lookup: str) -> t.Optional[Response]:
+        """
+        Returns an empty response with the ``offload_header`` header,
+        or ``None`` if offloading is disabled.
+        """
+        if self.offload_header is None:
+            return None
+
+        path = self._make_filepath(lookup)
+
+        if not os.path.isfile(path):
+            raise FileNotFound(f'File with path {lookup!r} not found.')
+
+        if self.offload_header == self.OFFLOAD_SENDFILE:
+            location = path
+        else:
+            location = self.offload_prefix + quote(
+                _LOOKUP_PREFIX_RE.sub('', lookup)
+            )
+
+        rv = current_app.response_class(
+            mimetype=guess_type(lookup) or 'application/octet-stream',
+        )
+        rv.headers[self.offload_header] = location
+        rv.headers['Content-Disposition'] = get_content_disposition(
+            os.path.basename(lookup)
+        )
+
+        return rv
+
     def remove(self, lookup: str) -> None:
         path = self._make_filepath(lookup)
         if os.path.exists(path):
             os.remove(path)
 
-    def _resolve_conflict(self, path: str) -> str:
+        index = self.get_index()
+
+        if index is not None:
+            index.remove(_LOOKUP_PREFIX_RE.sub('', lookup))
+
+    def remove_many(self, lookups: t.Iterable[str]) -> t.List[BatchResult]:
         """
-        If a file with the given path already exists in the file system,
-        this method is called to resolve the conflict.
-        It should return a new path for the file.
+        Deletes files in a thread pool of ``REMOVE_WORKERS`` threads
+        and removes their metadata from the index in one transaction.
+        """
+        lookups = list(lookups)
+        paths = [self._make_filepath(lookup) for lookup in lookups]
+
+        def unlink(path: str) -> t.Optional[Exception]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as err:
+                return err
+            return None
+
+        with ThreadPoolExecutor(self.REMOVE_WORKERS) as executor:
+            errors = list(executor.map(unlink, paths))
+
+        index = self.get_index()
+
+        if index is not None:
+            try:
+                index.remove_many(
+                    _LOOKUP_PREFIX_RE.sub('', lookup)
+                    for lookup, error in zip(lookups, errors)
+                    if error is None
+                )
+            except sqlite3.Error as err:
+                # The files are removed,
+                # the stale entries are dropped by the next reindex.
+                logger.warning(
+                    'Failed to remove files from the metadata index: %s', err
+                )
+
+        return [
+            BatchResult(lookup, error)
+            for lookup, error in zip(lookups, errors)
+        ]
+
+    def _find_last_index(self, path_pattern: str) -> int:
+        """
+        Returns the last index in a sequence of existing files
+        matching the given path pattern, otherwise 0.
 
         Runs in log(n) time
         where n is the number of existing files in sequence.
@@ -250,7 +1051,6 @@ class FileSystemStorage(AbstractStorage):
 
         .. _`James`: https://stackoverflow.com/a/47087513/10509709
         """
-        path_pattern = '%s_%%d%s' % os.path.splitext(path)
         i = 1
 
         # First do an exponential search
@@ -265,40 +1065,220 @@ class FileSystemStorage(AbstractStorage):
             c = (a + b) // 2  # interval midpoint
             a, b = (c, b) if os.path.exists(path_pattern % c) else (a, c)
 
-        return path_pattern % b
+        return a
+
+    def _iter_free_paths(self, path: str) -> t.Iterator[t.Tuple[int, str]]:
+        """
+        Returns an iterator over the candidate paths for a new file
+        and their indexes: first the path itself,
+        then the paths with the ``_N`` suffix.
+
+        The search starts after the last index used for the path pattern,
+        so saving into a crowded sequence costs a constant number of calls.
+        """
+        yield 0, path
+
+        path_pattern = '%s_%%d%s' % os.path.splitext(path)
+        index = self._last_indexes.get(path_pattern)
+        collisions = 0
+
+        if index is None:
+            index = self._find_last_index(path_pattern)
+
+        while True:
+            index += 1
+            yield index, path_pattern % index
+
+            collisions += 1
+
+            # Other processes are saving into the same sequence
+            if collisions % 8 == 0:
+                index = max(index, self._find_last_index(path_pattern))
+
+    def _resolve_conflict(self, path: str) -> str:
+        """
+        If a file with the given path already exists in the file system,
+        this method is called to resolve the conflict.
+        It should return a new path for the file.
+
+        The returned path is not reserved,
+        use :py:meth:`save` to claim a name atomically.
+        """
+        path_pattern = '%s_%%d%s' % os.path.splitext(path)
+        return path_pattern % (self._find_last_index(path_pattern) + 1)
+
+    def _move_exclusive(self, src_path: str, path: str) -> str:
+        """
+        Moves the file to the first free path found,
+        never overwriting an existing file, and returns that path.
+
+        The name is claimed atomically by a hard link,
+        which fails if the path exists.
+        If the file system does not support hard links,
+        the name is claimed by creating an empty file
+        with ``O_CREAT | O_EXCL``, which is then replaced.
+        """
+        path_pattern = '%s_%%d%s' % os.path.splitext(path)
+
+        for index, candidate in self._iter_free_paths(path):
+            try:
+                os.link(src_path, candidate)
+            except FileExistsError:
+                continue
+            except OSError:
+                try:
+                    fd = os.open(
+                        candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666
+                    )
+                except FileExistsError:
+                    continue
+                os.close(fd)
+                os.replace(src_path, candidate)
+            else:
+                os.remove(src_path)
+
+            if index:
+                self._last_indexes[path_pattern] = index
+
+            return candidate
+
+        raise AssertionError('unreachable')  # pragma: no cover
 
     def save(self, storage: FileStorage, overwrite: bool = False) -> str:
         root_dir = self.get_root_dir()
         lookup = self.generate_filename(storage)
         path = self._make_filepath(lookup)
 
-        if not overwrite and os.path.exists(path):
-            path = self._resolve_conflict(path)
-            lookup = os.path.relpath(path, root_dir)
-
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        storage.save(path)
+        dirname = os.path.dirname(path)
+        self._ensure_dir(dirname)
+
+        try:
+            position: t.Optional[int] = storage.stream.tell()
+        except (AttributeError, OSError):
+            position = None
+
+        try:
+            saved_path = self._write_file(storage, path, overwrite)
+        except FileNotFoundError:
+            if position is None:
+                raise
+            # The directory was removed by someone else,
+            # the stream may have been read to the end before that
+            self._known_dirs.discard(dirname)
+            self._ensure_dir(dirname)
+            storage.stream.seek(position)
+            saved_path = self._write_file(storage, path, overwrite)
+
+        if saved_path != path:
+            lookup = os.path.relpath(saved_path, root_dir)
+
+        index = self.get_index()
+
+        if index is not None:
+            lookup = _LOOKUP_PREFIX_RE.sub('', lookup)
+            try:
+                index.add(self._make_stat(lookup, saved_path, storage))
+            except sqlite3.Error as err:
+                # The file is saved and is found on disk,
+                # the entry is restored by the next reindex.
+                logger.warning(
+                    'Failed to add %r to the metadata index: %s', lookup, err
+                )
 
         return lookup
 
+    def _link_file(self, stream: t.BinaryIO, path: str) -> bool:
+        """
+        Creates a hard link to the uploaded file if it is a temporary file
+        of the request on the same file system.
+        Returns false if linking is not possible.
+
+        Other files are never linked, the stored file would share
+        the permissions and later changes of the caller's file.
+        """
+        if not is_upload_temp_file(stream):
+            return False
+
+        src_path = get_file_path(stream)
+
+        if src_path is None or stream.tell() != 0:
+            return False
+
+        stream.flush()
 
-def iter_files(storage: FileSystemStorage) -> t.Iterable[File]:
+        try:
+            os.link(src_path, path)
+        except OSError:
+            return False
+
+        # Temporary files are created with 0600 mode
+        os.chmod(path, 0o666 & ~get_umask())
+
+        if self.fsync != self.FSYNC_NONE:
+            os.fsync(t.cast(int, get_fileno(stream)))
+
+        return True
+
+    def _write_file(
+        self,
+        storage: FileStorage,
+        path: str,
+        overwrite: bool = True,
+    ) -> str:
+        """
+        Writes the uploaded file to the given path atomically
+        and returns the path to the saved file.
+
+        The uploaded file is linked or copied in the kernel
+        to a temporary file in the same directory,
+        which then replaces the destination path,
+        or is moved to a free path if ``overwrite`` is false.
+        """
+        stream = t.cast(t.BinaryIO, storage.stream)
+        dirname = os.path.dirname(path)
+        tmp_path = os.path.join(dirname, f'.{uuid.uuid4().hex}.tmp')
+
+        try:
+            if not self._link_file(stream, tmp_path):
+                with open(tmp_path, 'xb') as f:
+                    copy_stream(stream, t.cast(t.BinaryIO, f))
+                    if self.fsync != self.FSYNC_NONE:
+                        f.flush()
+                        os.fsync(f.fileno())
+
+            if overwrite:
+                os.replace(tmp_path, path)
+            else:
+                path = self._move_exclusive(tmp_path, path)
+        except BaseException:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if self.fsync == self.FSYNC_FULL:
+            fsync_dir(dirname)
+
+        return path
+
+
+def iter_files(
+    storage: FileSystemStorage,
+    prefix: str = '',
+    page_size: int = 1000,
+) -> t.Iterable[File]:
     """
     Returns an iterator over all files in the given file system storage.
 
-    This function cannot be used in a production environment
-    because it returns all files without any filtering.
-    This can lead to memory leaks and freezes.
+    The files are read page by page
+    with :py:meth:`FileSystemStorage.list_files`.
     """
-    upload_dir = storage.get_root_dir()
-
-    for root, dirs, files in os.walk(upload_dir):
-        for f in files:
-            path = os.path.abspath(os.path.join(root, f))
-            lookup = os.path.relpath(path, upload_dir)
-            yield File(
-                lookup=lookup,
-                path_or_file=path,
-                filename=os.path.basename(lookup),
-                mimetype=guess_type(lookup, use_external=True)
-            )
+    cursor = None
+
+    while True:
+        page = storage.list_files(prefix, page_size, cursor)
+        yield from page.files
+
+        if page.cursor is None:
+            break
+
+        cursor = page.cursor
@@ -1,19 +1,298 @@
 from __future__ import annotations
+from collections import OrderedDict
+import errno
+from functools import lru_cache
 import hashlib
+import io
 import os
 import re
+import threading
 import typing as t
+import unicodedata
+from urllib.parse import quote
+
+from werkzeug.http import dump_options_header
 
 
 __all__ = (
+    'LRUCache',
+    'copy_stream',
+    'fsync_dir',
+    'get_buffer_size',
+    'get_content_disposition',
     'get_extension',
+    'get_file_path',
+    'get_fileno',
+    'get_umask',
+    'hash_file',
+    'hash_stream',
     'increment_path',
+    'iter_chunks',
     'md5file',
     'md5stream',
+    'new_hash',
+    'register_hash',
     'split_pairs',
 )
 
 
+HashFactory = t.Callable[[], t.Any]
+
+_K = t.TypeVar('_K')
+_V = t.TypeVar('_V')
+
+MIN_BUFFER_SIZE = 65536
+MAX_BUFFER_SIZE = 1048576
+
+_hash_factories: t.Dict[str, HashFactory] = {}
+
+
+class LRUCache(t.Generic[_K, _V]):
+    """
+    A thread-safe dictionary that keeps
+    only the given number of the most recently used items.
+    """
+
+    __slots__ = ('maxsize', '_data', '_lock')
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        """
+        Arguments:
+            maxsize (int): The maximum number of items. Default to ``1024``.
+        """
+        self.maxsize = maxsize
+        self._data: OrderedDict[_K, _V] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: _K) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __setitem__(self, key: _K, value: _V) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Removes all items."""
+        with self._lock:
+            self._data.clear()
+
+    def get(
+        self,
+        key: _K,
+        default: t.Optional[_V] = None,
+    ) -> t.Optional[_V]:
+        """Returns the value for the key and marks it as recently used."""
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def pop(
+        self,
+        key: _K,
+        default: t.Optional[_V] = None,
+    ) -> t.Optional[_V]:
+        """Removes the key and returns its value."""
+        with self._lock:
+            return self._data.pop(key, default)
+
+
+def register_hash(name: str, factory: HashFactory) -> None:
+    """
+    Registers a hash algorithm under the given name.
+
+    Arguments:
+        name (str): The name of the algorithm.
+        factory (HashFactory):
+            A callable that returns a new hash object
+            with ``update`` and ``hexdigest`` methods.
+    """
+    _hash_factories[name.lower()] = factory
+
+
+def new_hash(algorithm: str) -> t.Any:
+    """
+    Returns a new hash object for the given algorithm.
+
+    Supports all algorithms of the ``hashlib`` module,
+    ``xxh64``, ``xxh128``, ``xxh3_64`` and ``xxh3_128`` if xxhash is installed,
+    ``blake3`` if blake3 is installed,
+    and the algorithms registered with :py:func:`register_hash`.
+    """
+    factory = _hash_factories.get(algorithm.lower())
+
+    if factory is not None:
+        return factory()
+
+    return hashlib.new(algorithm)
+
+
+try:
+    import xxhash
+except ImportError:  # pragma: no cover
+    pass
+else:
+    for _name in ('xxh64', 'xxh128', 'xxh3_64', 'xxh3_128'):
+        register_hash(_name, getattr(xxhash, _name))
+
+try:
+    import blake3
+except ImportError:  # pragma: no cover
+    pass
+else:
+    register_hash('blake3', blake3.blake3)
+
+
+def get_buffer_size(stream: t.BinaryIO) -> int:
+    """
+    Returns the size of the read buffer adapted to the rest of the stream.
+
+    Small files are read in one call,
+    large files in chunks from 64Kb up to 1Mb.
+    """
+    try:
+        position = stream.tell()
+        stream.seek(0, os.SEEK_END)
+        remaining = stream.tell() - position
+        stream.seek(position)
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return MIN_BUFFER_SIZE
+    return max(MIN_BUFFER_SIZE, min(remaining, MAX_BUFFER_SIZE))
+
+
+def copy_stream(src: t.BinaryIO, dst: t.BinaryIO) -> int:
+    """
+    Copies the source stream from the current position to the end
+    into the destination file and returns the number of bytes copied.
+
+    If both streams are real files, the data is copied inside the kernel
+    with ``os.copy_file_range`` or ``os.sendfile``,
+    otherwise through one reusable buffer.
+    """
+    src_fd = get_fileno(src)
+    dst_fd = get_fileno(dst)
+
+    copied = 0
+    count = None
+
+    if src_fd is not None and dst_fd is not None:
+        offset = src.tell()
+        count = os.fstat(src_fd).st_size - offset
+        dst_offset = dst.tell()
+        dst.flush()
+
+        copied = _copy_fd(src_fd, dst_fd, offset, count) or 0
+
+        if copied >= count:
+            src.seek(offset + copied)
+            return copied
+
+        # The kernel stopped early, the rest is copied through the buffer.
+        src.seek(offset + copied)
+        dst.seek(dst_offset + copied)
+
+    for chunk in iter_chunks(src):
+        dst.write(chunk)
+        copied += len(chunk)
+
+    if count is not None and copied < count:
+        raise OSError(
+            f'Copied {copied} of {count} bytes, the source was truncated.'
+        )
+
+    return copied
+
+
+def _copy_fd(
+    src_fd: int,
+    dst_fd: int,
+    offset: int,
+    count: int,
+) -> t.Optional[int]:
+    """
+    Copies the data between file descriptors inside the kernel
+    and returns the number of bytes copied, which is less than ``count``
+    if the kernel stops early.
+    Returns ``None`` if the system does not support it.
+    """
+    copied = 0
+
+    for func in ('copy_file_range', 'sendfile'):
+        if not hasattr(os, func):
+            continue
+        try:
+            while copied < count:
+                if func == 'copy_file_range':
+                    sent = os.copy_file_range(
+                        src_fd, dst_fd, count - copied, offset + copied
+                    )
+                else:
+                    sent = os.sendfile(
+                        dst_fd, src_fd, offset + copied, count - copied
+                    )
+                if not sent:
+                    break
+                copied += sent
+            return copied
+        except OSError as err:
+            if copied or err.errno not in (
+                errno.EINVAL,
+                errno.ENOSYS,
+                errno.EXDEV,
+                errno.EOPNOTSUPP,
+                errno.EBADF,
+            ):
+                raise
+
+    return None
+
+
+def fsync_dir(path: str) -> None:
+    """Flushes the directory entries of the given directory to disk."""
+    if os.name == 'nt':  # pragma: no cover
+        return
+
+    fd = os.open(path, os.O_RDONLY)
+
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def get_content_disposition(filename: str) -> str:
+    """
+    Returns the value of the ``Content-Disposition`` header
+    to download the file as an attachment with the given name.
+
+    Non-ASCII names are passed in the ``filename*`` parameter (RFC 6266),
+    the ``filename`` parameter gets the transliterated name.
+    """
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        simple = (
+            unicodedata.normalize('NFKD', filename)
+                       .encode('ascii', 'ignore')
+                       .decode('ascii')
+        )
+        quoted = quote(filename, safe="!#$&+^`|~")
+        return dump_options_header('attachment', {
+            'filename': simple,
+            'filename*': f"UTF-8''{quoted}",
+        })
+
+    return dump_options_header('attachment', {'filename': filename})
+
+
 def get_extension(filename: str) -> str:
     """Returns the file extension."""
     _, ext = os.path.splitext(filename)
@@ -48,32 +327,158 @@ def increment_path(path: str, filenames: t.Iterable[str]) -> str:
     )
 
 
-def md5file(filename: str) -> str:
+def get_file_path(stream: t.BinaryIO) -> t.Optional[str]:
+    """
+    Returns the absolute path to the file behind the stream,
+    if it is a regular file that can be hard linked, otherwise ``None``.
+    """
+    name = getattr(stream, 'name', None)
+    fd = get_fileno(stream)
+
+    if not isinstance(name, str) or not os.path.isabs(name) or fd is None:
+        return None
+
+    try:
+        st = os.stat(name)
+        fst = os.fstat(fd)
+    except OSError:
+        return None
+
+    if (st.st_dev, st.st_ino) != (fst.st_dev, fst.st_ino):
+        return None
+
+    return name
+
+
+def get_fileno(stream: t.BinaryIO) -> t.Optional[int]:
+    """
+    Returns the file descriptor of the stream,
+    or ``None`` if the data is stored in memory.
+    """
+    # SpooledTemporaryFile writes the data to disk when fileno() is called
+    if getattr(stream, '_rolled', True) is False:
+        return None
+
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+@lru_cache(maxsize=None)
+def get_umask() -> int:
+    """Returns the file mode creation mask of the process."""
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def hash_file(filename: str, algorithm: str = 'md5') -> str:
     """Returns the hash sum of the contents of the given file."""
     with open(filename, 'rb') as f:
-        return md5stream(f)
+        return hash_stream(t.cast(t.BinaryIO, f), algorithm)
 
 
-def md5stream(stream: t.BinaryIO, buffer_size: int = 16384) -> str:
+def hash_stream(
+    stream: t.BinaryIO,
+    algorithm: str = 'md5',
+    buffer_size: t.Optional[int] = None,
+) -> str:
     """
     Returns the hash sum of a binary data stream.
 
     Arguments:
         stream (bytes):
             Binary data stream.
+        algorithm (str):
+            The name of the hash algorithm, see :py:func:`new_hash`.
+            Default to ``md5``.
         buffer_size (int):
             The buffer size is the number of bytes
             held in memory during the hash process.
-            Default to 16Kb.
+            By default, adapts to the size of the stream.
     """
-    hash_md5 = hashlib.md5()
+    hash_obj = new_hash(algorithm)
 
-    for chunk in iter(lambda: stream.read(buffer_size), b''):
-        hash_md5.update(chunk)
+    for chunk in iter_chunks(stream, buffer_size):
+        hash_obj.update(chunk)
 
     stream.seek(0)
 
-    return hash_md5.hexdigest()
+    return t.cast(str, hash_obj.hexdigest())
+
+
+def iter_chunks(
+    stream: t.BinaryIO,
+    buffer_size: t.Optional[int] = None,
+) -> t.Iterator[memoryview]:
+    """
+    Returns an iterator over the chunks of a binary data stream
+    from the current position to the end.
+
+    Like ``hashlib.file_digest``, the data is read into one reusable buffer
+    without intermediate copies, so each chunk is only valid
+    until the next iteration. The in-memory ``BytesIO``
+    is returned as a single chunk without reading at all.
+
+    Arguments:
+        stream (bytes):
+            Binary data stream.
+        buffer_size (int):
+            The buffer size is the number of bytes
+            held in memory during the read.
+            By default, adapts to the size of the stream.
+    """
+    if isinstance(stream, io.BytesIO):
+        position = stream.tell()
+        view = stream.getbuffer()
+        chunk = view[position:]
+        try:
+            stream.seek(0, os.SEEK_END)
+            yield chunk
+        finally:
+            chunk.release()
+            view.release()
+        return
+
+    if buffer_size is None:
+        buffer_size = get_buffer_size(stream)
+
+    readinto = getattr(stream, 'readinto', None)
+
+    if readinto is None:
+        for data in iter(lambda: stream.read(buffer_size), b''):
+            yield memoryview(data)
+        return
+
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+
+    while True:
+        size = readinto(buffer)
+        if not size:
+            break
+        yield view[:size]
+
+
+def md5file(filename: str) -> str:
+    """Returns the MD5 hash sum of the contents of the given file."""
+    return hash_file(filename, 'md5')
+
+
+def md5stream(stream: t.BinaryIO, buffer_size: int = 16384) -> str:
+    """
+    Returns the MD5 hash sum of a binary data stream.
+
+    Arguments:
+        stream (bytes):
+            Binary data stream.
+        buffer_size (int):
+            The buffer size is the number of bytes
+            held in memory during the hash process.
+            Default to 16Kb.
+    """
+    return hash_stream(stream, 'md5', buffer_size)
 
 
 def split_pairs(
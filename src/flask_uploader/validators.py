@@ -1,14 +1,14 @@
 from __future__ import annotations
 
-import os
 import re
 import typing as t
 
-from PIL import Image, UnidentifiedImageError
+from PIL import Image
 from werkzeug.datastructures import FileStorage
 
 from . import formats
 from .exceptions import ValidationError
+from .inspection import inspect_upload
 from .utils import get_extension
 
 
@@ -174,9 +174,7 @@ class FileSize:
         self.message = message
 
     def __call__(self, storage: FileStorage) -> None:
-        storage.stream.seek(0, os.SEEK_END)
-        size = storage.stream.tell()
-        storage.stream.seek(0)
+        size = inspect_upload(storage).size
 
         if not(self.min_size <= size <= self.max_size):
             raise ValidationError(self.format_message(self.message))
@@ -262,14 +260,13 @@ class ImageSize:
         self.message = message
 
     def __call__(self, storage: FileStorage) -> None:
-        try:
-            image = Image.open(storage.stream)
-        except UnidentifiedImageError as err:
+        image_size = inspect_upload(storage).image_size
+
+        if image_size is None:
             message = 'Unsupported image type.' if self.message is None else self.message
-            raise ValidationError(self.format_message(message)) from err
+            raise ValidationError(self.format_message(message))
 
-        self.validate_image(image)
-        storage.stream.seek(0)
+        self.validate_size(*image_size)
 
     def format_message(self, message: str, **kwargs: t.Any) -> str:
         return message % {
@@ -281,7 +278,9 @@ class ImageSize:
         }
 
     def validate_image(self, image: Image.Image) -> None:
-        width, height = image.size
+        self.validate_size(*image.size)
+
+    def validate_size(self, width: int, height: int) -> None:
         invalid = (
             self.min_width >= 0 and self.min_width > width
             or
@@ -1,11 +1,13 @@
 from __future__ import annotations
 import inspect
+import os
 import typing as t
 from urllib.parse import urlparse
 
 from flask import (
     abort,
     current_app,
+    jsonify,
     redirect,
     request,
     send_file as _send_file,
@@ -13,17 +15,21 @@ from flask import (
 from flask.views import MethodView
 
 from .core import Uploader
-from .exceptions import FileNotFound
-from .storages import File
+from .exceptions import FileNotFound, ValidationError
+from .storages import File, FileStat
+from .utils import get_content_disposition
 
 if t.TYPE_CHECKING:
+    from datetime import datetime
     from flask.typing import ResponseReturnValue
+    from werkzeug.wrappers import Response
 
 
 __all__ = (
     'BaseView',
     'DestroyView',
     'DownloadView',
+    'PresignedPostView',
     'UploaderMixin',
 )
 
@@ -104,10 +110,115 @@ class DownloadView(BaseView):
       the static method
       :py:meth:`~flask_uploader.core.UploaderMeta.get_instance`.
       Used as the default view.
+
+    If the storage supports offloading,
+    see :py:meth:`~flask_uploader.storages.AbstractStorage.offload`,
+    the file is sent by the web server or by the storage itself.
+
+    ``HEAD`` requests and conditional ``GET`` requests are answered
+    from the metadata of the file,
+    see :py:meth:`~flask_uploader.storages.AbstractStorage.stat`,
+    without opening it.
     """
 
-    def send_file(self, f: File) -> ResponseReturnValue:
-        """Send the contents of a given file to the client."""
+    #: Cache lifetime in seconds for files whose contents never change.
+    immutable_max_age = 31536000
+
+    def _get_uploader_by_name(self, name: t.Optional[str]) -> Uploader:
+        if name is None:
+            return self.get_uploader()
+
+        uploader = Uploader.get_instance(name)
+
+        if not uploader.use_auto_route:
+            abort(404)
+
+        return uploader
+
+    def _set_cache_headers(
+        self,
+        rv: Response,
+        etag: t.Optional[str],
+        last_modified: t.Optional[datetime],
+        immutable: bool,
+    ) -> None:
+        if etag is not None:
+            rv.set_etag(etag)
+
+        if last_modified is not None:
+            rv.last_modified = last_modified
+
+        if immutable:
+            rv.cache_control.no_cache = None
+            rv.headers['Cache-Control'] = (
+                f'public, max-age={self.immutable_max_age}, immutable'
+            )
+
+    def is_immutable(
+        self,
+        uploader: Uploader,
+        f: t.Union[File, FileStat],
+    ) -> bool:
+        """
+        Returns true if the contents of the file never change
+        under the same lookup, as with content-addressed filenames.
+        """
+        return uploader.storage.digest_algorithm is not None
+
+    def send_stat(
+        self,
+        stat: FileStat,
+        immutable: bool = False,
+    ) -> Response:
+        """
+        Returns a response without a body
+        with the headers that sending the file would have.
+
+        Used for ``HEAD`` requests and ``304 Not Modified`` responses.
+
+        Arguments:
+            stat (FileStat):
+                The metadata of the file.
+            immutable (bool):
+                Allow clients to cache the file forever.
+                Default to ``False``.
+        """
+        rv = current_app.response_class(
+            mimetype=stat.mimetype or 'application/octet-stream',
+        )
+        rv.headers['Content-Disposition'] = get_content_disposition(
+            os.path.basename(stat.lookup)
+        )
+        rv.content_length = stat.size
+        rv.cache_control.no_cache = True
+        self._set_cache_headers(rv, stat.etag, stat.mtime, immutable)
+
+        return rv.make_conditional(
+            request,
+            accept_ranges=True,
+            complete_length=stat.size,
+        )
+
+    def send_file(
+        self,
+        f: File,
+        immutable: bool = False,
+    ) -> ResponseReturnValue:
+        """
+        Send the contents of a given file to the client.
+
+        Supports partial responses for ``Range`` requests
+        and ``304 Not Modified`` responses for conditional requests
+        if the storage returned the size, the modification time
+        or the entity tag of the file.
+
+        Arguments:
+            f (File):
+                The file to send.
+            immutable (bool):
+                Allow clients to cache the file forever.
+                Default to ``False``.
+        """
         kwargs = {}
         sig = inspect.signature(_send_file)
 
@@ -116,27 +227,112 @@ class DownloadView(BaseView):
         else:
             kwargs['attachment_filename'] = f.filename
 
-        return _send_file(
+        rv = _send_file(
             f.path_or_file,
             mimetype=f.mimetype,
             as_attachment=True,
+            conditional=False,
             **kwargs,  # type: ignore
         )
 
+        if rv.content_length is None and f.size is not None:
+            rv.content_length = f.size
+
+        self._set_cache_headers(rv, f.etag, f.last_modified, immutable)
+
+        return rv.make_conditional(
+            request,
+            accept_ranges=True,
+            complete_length=rv.content_length,
+        )
+
     def get(
         self,
         lookup: str,
         name: t.Optional[str] = None,
     ) -> ResponseReturnValue:
-        if name is None:
-            uploader = self.get_uploader()
-        else:
-            uploader = Uploader.get_instance(name)
-            if not uploader.use_auto_route:
-                abort(404)
+        uploader = self._get_uploader_by_name(name)
+
+        try:
+            rv = uploader.offload(lookup)
+
+            if rv is not None:
+                return rv
+
+            if request.if_none_match or request.if_modified_since:
+                try:
+                    stat = uploader.stat(lookup)
+                except (NotImplementedError, FileNotFound):
+                    # The file itself decides whether to answer 404
+                    pass
+                else:
+                    immutable = self.is_immutable(uploader, stat)
+                    rv = self.send_stat(stat, immutable)
+                    if rv.status_code == 304:
+                        return rv
+
+            f = uploader.load(lookup)
+            return self.send_file(f, self.is_immutable(uploader, f))
+        except FileNotFound as err:
+            current_app.logger.info(str(err))
+            abort(404)
+
+    def head(
+        self,
+        lookup: str,
+        name: t.Optional[str] = None,
+    ) -> ResponseReturnValue:
+        uploader = self._get_uploader_by_name(name)
+
+        try:
+            rv = uploader.offload(lookup)
+
+            if rv is not None:
+                return rv
+
+            stat = uploader.stat(lookup)
+        except (NotImplementedError, FileNotFound):
+            # The metadata may be missing for a file that can be loaded
+            return self.get(lookup, name)
+
+        return self.send_stat(stat, self.is_immutable(uploader, stat))
+
+
+class PresignedPostView(BaseView):
+    """
+    The view that handles direct uploads to the storage.
+
+    Used with two routes:
+
+    * ``POST /`` - accepts the ``filename`` of the selected file
+      (JSON or form data) and responds with the ``url`` and ``fields``
+      of the form to send the file to, and the future ``lookup``.
+    * ``POST /<path:lookup>`` - called after the file has been sent,
+      checks it and responds with the ``lookup`` and ``url`` of the file.
+
+    Validation errors are returned with the ``400`` status code.
+    """
+
+    def post(self, lookup: t.Optional[str] = None) -> ResponseReturnValue:
+        uploader = self.get_uploader()
 
         try:
-            return self.send_file(uploader.load(lookup))
+            if lookup is None:
+                data = request.get_json(silent=True) or request.form
+                filename = data.get('filename')
+
+                if not filename:
+                    abort(400)
+
+                post = uploader.generate_presigned_post(filename)
+                return jsonify(
+                    url=post.url, fields=post.fields, lookup=post.lookup
+                )
+
+            lookup = uploader.commit_presigned_post(lookup)
+            return jsonify(lookup=lookup, url=uploader.get_url(lookup))
+        except ValidationError as err:
+            return jsonify(error=str(err)), 400
         except FileNotFound as err:
             current_app.logger.info(str(err))
             abort(404)
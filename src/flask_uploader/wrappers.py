@@ -0,0 +1,89 @@
+from __future__ import annotations
+from tempfile import NamedTemporaryFile
+import typing as t
+
+from flask import current_app, Request as _Request
+
+from .inspection import HashingStream
+
+
+__all__ = (
+    'HashingRequestMixin',
+    'Request',
+    'is_upload_temp_file',
+)
+
+
+# Same as in werkzeug.formparser.default_stream_factory
+MAX_MEMORY_SIZE = 1024 * 500
+
+
+def is_upload_temp_file(stream: t.Any) -> bool:
+    """
+    Returns true if the stream is a temporary file
+    created by :py:class:`HashingRequestMixin` for an uploaded file.
+
+    Only these files are owned by the library
+    and can be hard linked by ``FileSystemStorage``.
+    """
+    return getattr(stream, '_uploader_temp_file', False) is True
+
+
+class HashingRequestMixin:
+    """
+    The mixin for the request class that hashes uploaded files
+    while the multipart data is being received.
+
+    The algorithm is set by the ``UPLOADER_RECEIVE_HASH_ALGORITHM`` option,
+    it must match the algorithm of the filename strategy,
+    otherwise the file will be hashed again when saving.
+
+    Large files are received into named temporary files
+    in the ``UPLOADER_TEMP_DIR`` directory,
+    so ``FileSystemStorage`` can link them instead of copying
+    if the directory is on the same file system.
+    """
+
+    def _get_file_stream(
+        self,
+        total_content_length: t.Optional[int],
+        content_type: t.Optional[str],
+        filename: t.Optional[str] = None,
+        content_length: t.Optional[int] = None,
+    ) -> t.IO[bytes]:
+        if total_content_length is None or (
+            total_content_length > MAX_MEMORY_SIZE
+        ):
+            temp_file = NamedTemporaryFile(
+                'rb+',
+                dir=current_app.config.get('UPLOADER_TEMP_DIR'),
+            )
+            temp_file._uploader_temp_file = True  # type: ignore
+            stream = t.cast(t.BinaryIO, temp_file)
+        else:
+            stream = super()._get_file_stream(  # type: ignore
+                total_content_length,
+                content_type,
+                filename,
+                content_length,
+            )
+
+        algorithm = current_app.config.get(
+            'UPLOADER_RECEIVE_HASH_ALGORITHM', 'md5'
+        )
+
+        if not algorithm:
+            return t.cast(t.IO[bytes], stream)
+
+        return t.cast(t.IO[bytes], HashingStream(stream, algorithm))
+
+
+class Request(HashingRequestMixin, _Request):
+    """
+    The request class that hashes uploaded files while receiving.
+
+    Usage::
+
+        app = Flask(__name__)
+        app.request_class = Request
+    """
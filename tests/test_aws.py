@@ -0,0 +1,625 @@
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+import boto3
+from botocore.client import Config
+from botocore.exceptions import ClientError, EndpointConnectionError
+from flask import Flask
+import pytest
+import requests
+from werkzeug.datastructures import FileStorage
+
+moto = pytest.importorskip('moto')
+
+from flask_uploader.contrib.aws import (  # noqa: E402
+    AWS,
+    S3ObjectReader,
+    S3Storage,
+    iter_files,
+)
+from flask_uploader import init_uploader, Uploader  # noqa: E402
+from flask_uploader.exceptions import (  # noqa: E402
+    FileNotFound,
+    PermissionDenied,
+    ValidationError,
+)
+from flask_uploader.validators import Extension, FileSize  # noqa: E402
+from flask_uploader.views import PresignedPostView  # noqa: E402
+
+
+BUCKET = 'uploads'
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with moto.mock_aws():
+        resource = boto3.resource('s3')
+        resource.create_bucket(Bucket=BUCKET)
+        yield resource
+
+
+@pytest.fixture
+def storage(s3):
+    return S3Storage(s3, BUCKET, key_prefix='files')
+
+
+def test_load_streams_object(storage, s3):
+    data = b'0123456789' * 1000
+    s3.Object(BUCKET, 'files/a.txt').put(Body=data, ContentType='text/plain')
+
+    f = storage.load('a.txt')
+
+    assert isinstance(f.path_or_file, S3ObjectReader)
+    assert f.size == len(data)
+    assert f.mimetype == 'text/plain'
+    assert f.etag and '"' not in f.etag
+    assert f.last_modified is not None
+
+    reader = f.path_or_file
+    assert reader.read(10) == data[:10]
+    assert reader.tell() == 10
+
+    reader.seek(5000)
+    assert reader.read(10) == data[5000:5010]
+
+    reader.seek(-5, io.SEEK_END)
+    assert reader.read() == data[-5:]
+    assert reader.read(1) == b''
+
+    reader.seek(0)
+    assert reader.read() == data
+    reader.close()
+
+
+def test_load_missing(storage):
+    with pytest.raises(FileNotFound):
+        storage.load('missing.txt')
+
+
+def test_save_and_load(storage):
+    lookup = storage.save(
+        FileStorage(io.BytesIO(b'hello'), filename='hello.txt')
+    )
+    assert storage.load(lookup).path_or_file.read() == b'hello'
+
+
+def test_stat(storage, s3, mocker):
+    lookup = storage.save(
+        FileStorage(io.BytesIO(b'hello'), filename='hello.txt')
+    )
+    get_object = mocker.spy(s3.meta.client, 'get_object')
+
+    stat = storage.stat(lookup)
+    assert stat.size == 5
+    assert stat.mimetype == 'text/plain'
+    assert stat.digest == hashlib.md5(b'hello').hexdigest()
+    assert stat.etag == storage.load(lookup).etag
+    assert storage.exists(lookup)
+    assert get_object.call_count == 1
+
+    assert not storage.exists('missing.txt')
+    with pytest.raises(FileNotFound):
+        storage.stat('missing.txt')
+
+
+def test_save_many(storage):
+    uploader = Uploader('s3_save_many', storage)
+    data = [b'%d' % i for i in range(20)]
+
+    results = uploader.save_many(
+        FileStorage(io.BytesIO(d), filename='a.txt') for d in data
+    )
+
+    assert all(r.error is None for r in results)
+    assert [
+        storage.load(r.lookup).path_or_file.read() for r in results
+    ] == data
+
+
+def test_save_many_shares_clients(s3, mocker):
+    app = Flask(__name__)
+    aws = AWS(app)
+    create_session = mocker.spy(AWS, '_create_session')
+    uploader = Uploader(
+        's3_save_many_shares_clients', S3Storage(aws.resource('s3'), BUCKET)
+    )
+    save = S3Storage.save
+    used = set()
+
+    def record(self, *args, **kwargs):
+        used.add((
+            threading.get_ident(),
+            id(self.get_resource()),
+            id(self.get_client()),
+        ))
+        return save(self, *args, **kwargs)
+
+    mocker.patch.object(S3Storage, 'save', record)
+
+    with app.app_context():
+        results = uploader.save_many(
+            FileStorage(io.BytesIO(b'%d' % i), filename='a.txt')
+            for i in range(8)
+        )
+
+    assert all(r.error is None for r in results)
+    assert create_session.call_count == 1
+    # Resources are not thread-safe, only the client is shared
+    assert len({c for _, _, c in used}) == 1
+    assert len({r for _, r, _ in used}) == len({t for t, _, _ in used})
+
+
+def test_remove_many(storage, s3, mocker):
+    mocker.patch.object(S3Storage, 'MAX_DELETE_KEYS', 2)
+    delete_objects = mocker.spy(s3.meta.client, 'delete_objects')
+    lookups = [
+        storage.save(FileStorage(io.BytesIO(b'%d' % i), filename='a.txt'))
+        for i in range(5)
+    ]
+
+    results = storage.remove_many(lookups + [lookups[0], 'missing.txt'])
+
+    assert [r.lookup for r in results] == lookups + [lookups[0], 'missing.txt']
+    assert all(r.error is None for r in results)
+    assert delete_objects.call_count == 3
+    assert not list(s3.Bucket(BUCKET).objects.all())
+
+
+def test_remove_many_errors(storage, s3, mocker):
+    mocker.patch.object(
+        s3.meta.client,
+        'delete_objects',
+        return_value={
+            'Errors': [
+                {'Key': 'files/b.txt', 'Code': 'AccessDenied', 'Message': ''},
+            ],
+        },
+    )
+
+    results = storage.remove_many(['a.txt', 'b.txt'])
+
+    assert results[0].error is None
+    assert isinstance(results[1].error, PermissionDenied)
+
+
+def test_remove_many_connection_error(storage, s3, mocker):
+    mocker.patch.object(S3Storage, 'MAX_DELETE_KEYS', 1)
+    delete_objects = s3.meta.client.delete_objects
+    calls = []
+
+    def fail_second(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 2:
+            raise EndpointConnectionError(endpoint_url='http://s3')
+        if len(calls) == 3:
+            raise ClientError(
+                {'Error': {'Code': 'NoSuchBucket', 'Message': ''}},
+                'DeleteObjects',
+            )
+        return delete_objects(**kwargs)
+
+    mocker.patch.object(s3.meta.client, 'delete_objects', fail_second)
+
+    results = storage.remove_many(['a.txt', 'b.txt', 'c.txt'])
+
+    assert results[0].error is None
+    assert isinstance(results[1].error, PermissionDenied)
+    assert isinstance(results[1].error.__cause__, EndpointConnectionError)
+    assert isinstance(results[2].error, FileNotFound)
+
+
+def test_offload_redirect(storage, s3):
+    assert storage.offload('a.txt') is None
+
+    storage.offload_redirect = True
+    storage.is_public = False
+    rv = storage.offload('a.txt')
+
+    assert rv.status_code == 302
+    assert '/files/a.txt?' in rv.location
+    assert 'response-content-disposition=attachment' in rv.location
+
+
+def test_presigned_url_cache(storage, mocker):
+    storage.is_public = False
+    storage.url_expires_in = 100
+    clock = mocker.patch('flask_uploader.contrib.aws.time.time')
+    sign = mocker.spy(S3Storage, '_generate_presigned_url')
+
+    clock.return_value = 1010.0
+    url = storage.get_url('a.txt')
+    clock.return_value = 1049.0
+    assert storage.get_url('a.txt') == url
+    assert sign.call_count == 1
+
+    clock.return_value = 1050.0
+    storage.get_url('a.txt')
+    assert sign.call_count == 2
+
+    storage.get_url('b.txt')
+    assert sign.call_count == 3
+
+
+def test_presigned_url_aligned(s3, mocker):
+    now = time.time()
+    mocker.patch('flask_uploader.contrib.aws.time.time', return_value=now)
+    client = boto3.resource(
+        's3',
+        region_name='us-east-1',
+        config=Config(signature_version='s3v4'),
+    )
+    storage = S3Storage(client, BUCKET, is_public=False, url_expires_in=100)
+    query = dict(urllib.parse.parse_qsl(
+        urllib.parse.urlsplit(storage.get_url('a.txt')).query
+    ))
+
+    # Every URL of the window expires at the same time
+    signed_at = datetime.strptime(
+        query['X-Amz-Date'], '%Y%m%dT%H%M%SZ'
+    ).replace(tzinfo=timezone.utc).timestamp()
+    expires_at = signed_at + int(query['X-Amz-Expires'])
+    assert abs(expires_at - (now // 50 * 50 + 100)) <= 2
+
+
+def test_url_refresh_fraction(s3):
+    with pytest.raises(ValueError):
+        S3Storage(s3, BUCKET, url_refresh_fraction=1)
+
+
+def test_presigned_url_cache_disabled(s3):
+    storage = S3Storage(s3, BUCKET, is_public=False, url_cache_size=0)
+    storage.get_url('a.txt')
+    assert len(storage._url_cache) == 0
+
+
+def test_persistent_clients(s3):
+    app = Flask(__name__)
+    app.config['AWS_PERSISTENT_CLIENTS'] = True
+    app.config['AWS_MAX_POOL_CONNECTIONS'] = 32
+    aws = AWS(app)
+    resource = aws.resource('s3')
+
+    def get_objects():
+        with app.app_context():
+            return resource._get_current_object(), resource.meta.client
+
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(lambda _: get_objects(), range(8)))
+
+    resources = {id(r) for r, _ in results}
+    clients = {id(c) for _, c in results}
+
+    assert len(clients) == 1
+    assert len(resources) == 8
+    assert results[0][1].meta.config.max_pool_connections == 32
+
+    with app.app_context():
+        assert aws.client('s3')._get_current_object() is results[0][1]
+        assert resource.Bucket(BUCKET).creation_date is not None
+
+
+@pytest.mark.parametrize('persistent', [True, False])
+def test_clients_keyed_by_config(s3, persistent):
+    app = Flask(__name__)
+    app.config['AWS_PERSISTENT_CLIENTS'] = persistent
+    aws = AWS(app)
+    eu = aws.resource('s3', region_name='eu-west-1')
+    minio = aws.resource('s3', endpoint_url='http://minio:9000')
+    again = aws.resource(
+        's3', config=Config(s3={'addressing_style': 'path'}),
+        region_name='eu-west-1',
+    )
+
+    with app.app_context():
+        assert eu.meta.client.meta.region_name == 'eu-west-1'
+        assert minio.meta.client.meta.endpoint_url == 'http://minio:9000'
+        assert again.meta.client is not eu.meta.client
+        assert aws.resource('s3', region_name='eu-west-1').meta.client is (
+            eu.meta.client
+        )
+        assert aws.resource(
+            's3', config=Config(s3={'addressing_style': 'path'}),
+            region_name='eu-west-1',
+        ).meta.client is again.meta.client
+        assert aws.resource(
+            's3', config=Config(s3={'addressing_style': 'virtual'}),
+            region_name='eu-west-1',
+        ).meta.client is not again.meta.client
+
+
+@pytest.fixture
+def multipart_storage(s3):
+    return S3Storage(
+        s3,
+        BUCKET,
+        multipart_threshold=S3Storage.MIN_PART_SIZE,
+        multipart_chunksize=S3Storage.MIN_PART_SIZE,
+        max_concurrency=2,
+    )
+
+
+def test_multipart_upload(multipart_storage, s3):
+    data = os.urandom(S3Storage.MIN_PART_SIZE * 2 + 100)
+    lookup = multipart_storage.save(
+        FileStorage(io.BytesIO(data), filename='big.bin')
+    )
+
+    obj = s3.Object(BUCKET, lookup)
+    assert obj.get()['Body'].read() == data
+    assert obj.e_tag.strip('"').endswith('-3')
+
+
+def test_multipart_upload_aborted(multipart_storage, s3, mocker):
+    client = s3.meta.client
+    upload_part = client.upload_part
+
+    def fail_second_part(**kwargs):
+        if kwargs['PartNumber'] == 2:
+            raise ClientError({'Error': {'Code': '500'}}, 'UploadPart')
+        return upload_part(**kwargs)
+
+    mocker.patch.object(client, 'upload_part', side_effect=fail_second_part)
+    data = os.urandom(S3Storage.MIN_PART_SIZE * 3)
+
+    with pytest.raises(PermissionDenied):
+        multipart_storage.save(
+            FileStorage(io.BytesIO(data), filename='big.bin')
+        )
+
+    assert 'Uploads' not in client.list_multipart_uploads(Bucket=BUCKET)
+    assert 'Contents' not in client.list_objects_v2(Bucket=BUCKET)
+
+
+def save_many(storage, count, data=b'data'):
+    return [
+        storage.save(FileStorage(io.BytesIO(data), filename='a.txt'))
+        for _ in range(count)
+    ]
+
+
+def test_conditional_writes(s3, mocker):
+    storage = S3Storage(s3, BUCKET, filename_strategy=lambda s: 'a')
+    client = s3.meta.client
+    head = mocker.spy(client, 'head_object')
+    listing = mocker.spy(client, 'list_objects')
+    listing_v2 = mocker.spy(client, 'list_objects_v2')
+
+    assert save_many(storage, 1) == ['a.txt']
+    assert head.call_count == 0
+
+    assert save_many(storage, 3) == ['a_1.txt', 'a_2.txt', 'a_3.txt']
+    assert listing.call_count == listing_v2.call_count == 0
+    assert storage.conditional_writes
+
+
+def test_conditional_writes_unsupported(s3, mocker):
+    storage = S3Storage(s3, BUCKET, filename_strategy=lambda s: 'a')
+    client = s3.meta.client
+    put_object = client.put_object
+
+    def put_without_conditions(**kwargs):
+        if 'IfNoneMatch' in kwargs:
+            raise ClientError(
+                {'Error': {'Code': 'NotImplemented'}}, 'PutObject'
+            )
+        return put_object(**kwargs)
+
+    mocker.patch.object(client, 'put_object', put_without_conditions)
+
+    assert save_many(storage, 3) == ['a.txt', 'a_1.txt', 'a_2.txt']
+    assert not storage.conditional_writes
+
+
+def test_conditional_writes_invalid_argument(s3, mocker):
+    storage = S3Storage(s3, BUCKET)
+    error = ClientError(
+        {'Error': {'Code': 'InvalidArgument', 'Message': 'Bad ACL'}},
+        'PutObject',
+    )
+    mocker.patch.object(s3.meta.client, 'put_object', side_effect=error)
+
+    with pytest.raises(PermissionDenied):
+        storage.save(FileStorage(io.BytesIO(b'data'), 'a.txt'))
+
+    assert storage.conditional_writes
+
+
+def test_conditional_multipart(s3):
+    storage = S3Storage(
+        s3,
+        BUCKET,
+        filename_strategy=lambda s: 'a',
+        multipart_threshold=S3Storage.MIN_PART_SIZE,
+    )
+    data = os.urandom(S3Storage.MIN_PART_SIZE)
+
+    assert save_many(storage, 2, data) == ['a.txt', 'a_1.txt']
+    assert s3.Object(BUCKET, 'a_1.txt').get()['Body'].read() == data
+
+
+def test_presigned_post(s3):
+    storage = S3Storage(s3, BUCKET, key_prefix='files')
+    uploader = Uploader('test_presigned_post', storage, validators=[
+        Extension(Extension.IMAGES),
+        FileSize('1k'),
+    ])
+
+    with pytest.raises(ValidationError):
+        uploader.generate_presigned_post('notes.txt')
+
+    post = uploader.generate_presigned_post('photo.PNG')
+    assert post.lookup.endswith('.png')
+    assert post.fields['Content-Type'] == 'image/png'
+
+    policy = json.loads(base64.b64decode(post.fields['policy']))
+    assert ['content-length-range', 0, 1024] in policy['conditions']
+    assert {'Content-Type': 'image/png'} in policy['conditions']
+
+    # The local stand-in does not enforce the policy
+    rv = requests.post(post.url, data=post.fields, files={
+        'file': ('photo.png', b'x' * 2048),
+    })
+    assert rv.status_code == 204
+
+    with pytest.raises(ValidationError):
+        uploader.commit_presigned_post(post.lookup)
+
+    assert not storage._object_exists(storage._make_key(post.lookup))
+
+    rv = requests.post(post.url, data=post.fields, files={
+        'file': ('photo.png', b'x' * 512),
+    })
+    assert rv.status_code == 204
+    assert uploader.commit_presigned_post(post.lookup) == post.lookup
+
+    with pytest.raises(FileNotFound):
+        uploader.commit_presigned_post('missing.png')
+
+
+def test_commit_presigned_post_rejects(s3):
+    storage = S3Storage(s3, BUCKET)
+    uploader = Uploader('test_commit_presigned_post_rejects', storage, [
+        Extension(Extension.IMAGES),
+    ])
+    s3.Object(BUCKET, 'a.png').put(
+        Body=b'data',
+        ContentType='text/html',
+        Metadata={'presigned-post': '1'},
+    )
+
+    with pytest.raises(ValidationError):
+        uploader.commit_presigned_post('a.png')
+
+    assert not storage._object_exists('a.png')
+
+
+def test_commit_presigned_post_foreign_object(s3):
+    storage = S3Storage(s3, BUCKET)
+    uploader = Uploader('test_commit_presigned_post_foreign_object', storage, [
+        Extension(['mp4']),
+    ])
+    lookup = storage.save(FileStorage(io.BytesIO(b'data'), 'a.mp4'))
+    post = uploader.generate_presigned_post('b.mp4')
+
+    assert post.fields['Content-Type'] == 'video/mp4'
+
+    with pytest.raises(FileNotFound):
+        uploader.commit_presigned_post(lookup)
+
+    assert storage._object_exists(lookup)
+
+    rv = requests.post(post.url, data=post.fields, files={
+        'file': ('b.mp4', b'data'),
+    })
+    assert rv.status_code == 204
+    assert uploader.commit_presigned_post(post.lookup) == post.lookup
+
+
+def test_presigned_post_view(s3):
+    app = Flask(__name__)
+    init_uploader(app)
+    uploader = Uploader('test_presigned_post_view', S3Storage(s3, BUCKET), [
+        Extension(Extension.IMAGES),
+    ])
+    view = PresignedPostView.as_view('direct', uploader)
+    app.add_url_rule('/direct/', view_func=view, methods=['POST'])
+    app.add_url_rule('/direct/<path:lookup>', view_func=view)
+    client = app.test_client()
+
+    rv = client.post('/direct/', json={'filename': 'a.exe'})
+    assert rv.status_code == 400
+
+    rv = client.post('/direct/', json={'filename': 'a.png'})
+    assert rv.status_code == 200
+    lookup = rv.json['lookup']
+
+    assert client.post(f'/direct/{lookup}').status_code == 404
+
+    s3.Object(BUCKET, lookup).put(
+        Body=b'data',
+        ContentType='image/png',
+        Metadata={'presigned-post': '1'},
+    )
+    rv = client.post(f'/direct/{lookup}')
+    assert rv.status_code == 200
+    assert rv.json['lookup'] == lookup
+
+
+def test_direct_upload_field(s3, mocker):
+    from flask_wtf import FlaskForm
+    from flask_uploader.contrib.wtf import UploadField
+
+    app = Flask(__name__)
+    app.config['WTF_CSRF_ENABLED'] = False
+    init_uploader(app)
+    uploader = Uploader('test_direct_upload_field', S3Storage(s3, BUCKET), [
+        Extension(Extension.IMAGES),
+    ])
+    commit = mocker.spy(Uploader, 'commit_presigned_post')
+
+    class PhotoForm(FlaskForm):
+        photo = UploadField(uploader=uploader, direct_upload=True)
+
+    post = uploader.generate_presigned_post('a.png')
+    rv = requests.post(post.url, data=post.fields, files={
+        'file': ('a.png', b'data'),
+    })
+    assert rv.status_code == 204
+
+    with app.test_request_context(
+        method='POST', data={'photo': post.lookup}
+    ):
+        form = PhotoForm()
+        assert form.validate()
+        assert form.photo.save() == post.lookup
+
+    commit.assert_called_once_with(uploader, post.lookup)
+
+
+def test_list_files(storage, s3, mocker):
+    for name in ('a.txt', 'b.png', 'c.txt', 'd.txt', 'other.txt'):
+        s3.Object(BUCKET, f'files/{name}').put(Body=name.encode())
+
+    s3.Object(BUCKET, 'outside.txt').put(Body=b'')
+    head = mocker.spy(s3.meta.client, 'head_object')
+    get_url = mocker.spy(S3Storage, 'get_url')
+
+    page = storage.list_files(limit=2)
+    assert [f.lookup for f in page.files] == ['a.txt', 'b.png']
+    assert page.files[1].mimetype == 'image/png'
+    assert page.files[1].size == 5
+    assert page.files[1].etag and page.files[1].last_modified
+
+    page = storage.list_files(limit=2, cursor=page.cursor)
+    assert [f.lookup for f in page.files] == ['c.txt', 'd.txt']
+
+    page = storage.list_files(prefix='o')
+    assert [f.lookup for f in page.files] == ['other.txt']
+    assert page.cursor is None
+
+    page = storage.list_files(start_after='c.txt')
+    assert [f.lookup for f in page.files] == ['d.txt', 'other.txt']
+
+    assert head.call_count == 0
+    assert get_url.call_count == 7
+    assert isinstance(page.files[0].path_or_file, str)
+    assert page.files[0].path_or_file.endswith('/files/d.txt')
+
+    storage.is_public = False
+    url = storage.list_files(prefix='a').files[0].path_or_file
+    assert url == storage.get_url('a.txt')
+    assert 'Signature=' in url or 'X-Amz-Signature=' in url
+
+    lookups = [f.lookup for f in iter_files(storage, page_size=2)]
+    assert lookups == ['a.txt', 'b.png', 'c.txt', 'd.txt', 'other.txt']
@@ -0,0 +1,204 @@
+from datetime import datetime, timedelta, timezone
+import hashlib
+import os
+from io import BytesIO
+import sqlite3
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from flask_uploader.exceptions import FileNotFound
+from flask_uploader.index import SQLiteIndex
+from flask_uploader.inspection import inspect_upload
+from flask_uploader.storages import FileSystemStorage, TimestampStrategy
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return FileSystemStorage(
+        str(tmp_path),
+        filename_strategy=TimestampStrategy(fmt='name'),
+        index_path='.index.sqlite3',
+    )
+
+
+def save(storage, data=b'content', filename='input.txt'):
+    upload = FileStorage(BytesIO(data), filename)
+    inspect_upload(upload, 'md5')
+    return storage.save(upload)
+
+
+def test_save_and_remove(storage, mocker):
+    lookup = save(storage)
+    spy = mocker.spy(os, 'stat')
+
+    stat = storage.stat(lookup)
+    assert stat.size == 7
+    assert stat.digest == hashlib.md5(b'content').hexdigest()
+    assert stat.mimetype == 'text/plain'
+    assert stat.original_filename == 'input.txt'
+    assert storage.exists(lookup)
+    assert spy.call_count == 0
+
+    storage.remove(lookup)
+    assert not storage.exists(lookup)
+    with pytest.raises(FileNotFound):
+        storage.stat(lookup)
+
+
+def test_list_and_queries(storage):
+    lookups = [save(storage, b'%d' % i) for i in range(5)]
+    index = storage.get_index()
+
+    page = storage.list_files(limit=3)
+    assert [f.lookup for f in page.files] == sorted(lookups)[:3]
+    page = storage.list_files(limit=3, cursor=page.cursor)
+    assert [f.lookup for f in page.files] == sorted(lookups)[3:]
+    assert page.cursor is None
+
+    assert index.count() == 5
+    assert index.count('name_') == 4
+    assert index.total_size() == 5
+    assert len(index.find(mimetype='text/plain')) == 5
+    future = datetime.now(timezone.utc) + timedelta(days=1)
+    assert index.find(modified_after=future) == []
+
+
+def test_reindex(storage, tmp_path):
+    save(storage)
+    (tmp_path / 'other.txt').write_bytes(b'other')
+    storage.get_index().add(storage.stat('name.txt')._replace(lookup='gone'))
+
+    assert storage.reindex('md5') == 2
+    assert not storage.exists('gone')
+    stat = storage.stat('other.txt')
+    assert stat.digest == hashlib.md5(b'other').hexdigest()
+
+
+def test_add_many_releases_lock(storage):
+    lookup = save(storage)
+    index = storage.get_index()
+    other = SQLiteIndex(index.path, timeout=0.1)
+    stat = index.get(lookup)
+
+    def stats():
+        for i in range(5):
+            # Another process saves a file while the walk is in progress
+            other.add(stat._replace(
+                lookup=f'new_{i}', mtime=datetime.now(timezone.utc)
+            ))
+            yield stat._replace(lookup=f'old_{i}')
+
+    assert index.add_many(stats(), replace_all=True, batch_size=2) == 5
+    assert index.count('old_') == 5
+    assert index.count('new_') == 5
+    assert index.get(lookup) is None
+
+
+def test_reindex_concurrent_changes(storage, tmp_path, mocker):
+    for name in ('a.txt', 'b.txt'):
+        (tmp_path / name).write_bytes(name.encode())
+
+    index = storage.get_index()
+    other = SQLiteIndex(index.path)
+    iter_dir = FileSystemStorage._iter_dir
+
+    def iter_dir_with_changes(self, *args):
+        for f in iter_dir(self, *args):
+            yield f
+            if f.lookup == 'a.txt':
+                # A file saved with an old modification time
+                (tmp_path / 'c.txt').write_bytes(b'c')
+                os.utime(tmp_path / 'c.txt', (0, 0))
+                other.add(storage._make_stat('c.txt', str(tmp_path / 'c.txt')))
+            elif f.lookup == 'b.txt':
+                # A file removed after it was read
+                os.remove(tmp_path / 'b.txt')
+                other.remove('b.txt')
+
+    mocker.patch.object(
+        FileSystemStorage, '_iter_dir', iter_dir_with_changes
+    )
+    storage.reindex()
+
+    assert index.get('a.txt') is not None
+    assert index.get('b.txt') is None
+    assert index.get('c.txt') is not None
+
+
+def test_list_order_matches_file_system(tmp_path):
+    names = ['a.txt', 'a/b.txt', 'a-b.txt', 'a/c/d.txt', 'ab.txt', 'a/b-c']
+
+    for name in names:
+        path = tmp_path / 'files' / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'')
+
+    plain = FileSystemStorage(str(tmp_path / 'files'))
+    indexed = FileSystemStorage(
+        str(tmp_path / 'files'), index_path=str(tmp_path / 'index.sqlite3')
+    )
+    indexed.reindex()
+
+    for prefix in ('', 'a', 'a/'):
+        pages = []
+
+        for storage in (plain, indexed):
+            lookups, cursor = [], None
+            while True:
+                page = storage.list_files(prefix, limit=2, cursor=cursor)
+                lookups.extend(f.lookup for f in page.files)
+                if page.cursor is None:
+                    break
+                cursor = page.cursor
+            pages.append(lookups)
+
+        assert pages[0] == pages[1]
+        assert len(pages[0]) == len([n for n in names if n.startswith(prefix)])
+
+
+def test_migrate_old_index(tmp_path):
+    path = str(tmp_path / 'old.sqlite3')
+    conn = sqlite3.connect(path)
+    conn.execute(
+        'CREATE TABLE files (lookup TEXT PRIMARY KEY, size INTEGER NOT NULL, '
+        'mtime REAL NOT NULL, digest TEXT, mimetype TEXT, '
+        'original_filename TEXT) WITHOUT ROWID'
+    )
+    conn.execute("INSERT INTO files VALUES ('a.txt', 1, 0, NULL, NULL, NULL)")
+    conn.commit()
+    conn.close()
+
+    index = SQLiteIndex(path)
+    assert [s.lookup for s in index.list()] == ['a.txt']
+    assert index.add_many([], replace_all=True) == 0
+    assert index.count() == 0
+
+
+def test_save_tolerates_index_errors(storage, mocker):
+    mocker.patch.object(
+        SQLiteIndex, 'add', side_effect=sqlite3.OperationalError('locked')
+    )
+    lookup = save(storage)
+    assert os.path.exists(os.path.join(storage.get_root_dir(), lookup))
+
+
+def test_remove_many(storage):
+    lookups = [save(storage) for _ in range(3)]
+    results = storage.remove_many(lookups[:2])
+
+    assert [r.error for r in results] == [None, None]
+    assert not storage.exists(lookups[0])
+    assert storage.get_index().count() == 1
+
+
+def test_remove_many_tolerates_index_errors(storage, mocker):
+    lookup = save(storage)
+    mocker.patch.object(
+        SQLiteIndex,
+        'remove_many',
+        side_effect=sqlite3.OperationalError('locked'),
+    )
+
+    assert [r.error for r in storage.remove_many([lookup])] == [None]
+    assert not os.path.exists(os.path.join(storage.get_root_dir(), lookup))
@@ -0,0 +1,82 @@
+import hashlib
+from io import BytesIO
+
+from werkzeug.datastructures import FileStorage
+from PIL import Image
+
+from flask_uploader.inspection import inspect_upload
+
+
+def make_image(size, fmt='PNG'):
+    buf = BytesIO()
+    Image.new('RGB', size).save(buf, fmt)
+    buf.seek(0)
+    return buf
+
+
+def test_inspect_reads_stream_once(mocker):
+    data = b'x' * 100000
+    stream = BytesIO(data)
+    spy = mocker.spy(stream, 'read')
+    storage = FileStorage(stream, 'input.txt')
+
+    info = inspect_upload(storage, 'md5', buffer_size=4096)
+    calls = spy.call_count
+
+    assert info.size == len(data)
+    assert info.digest == hashlib.md5(data).hexdigest()
+    assert info.header == data[:65536]
+    assert info.image_size is None
+    assert stream.tell() == 0
+
+    assert inspect_upload(storage) is info
+    assert inspect_upload(storage, 'md5') is info
+    assert spy.call_count == calls
+
+
+def test_inspect_without_digest():
+    storage = FileStorage(BytesIO(b'Text file'), 'input.txt')
+    info = inspect_upload(storage)
+    assert info.size == 9
+    assert info.digest is None
+    assert info.header == b'Text file'
+
+
+def test_inspect_image():
+    storage = FileStorage(make_image((120, 80)), 'image.png')
+    info = inspect_upload(storage, 'md5')
+    assert info.image_format == 'PNG'
+    assert info.image_size == (120, 80)
+
+
+def test_inspect_new_stream():
+    storage = FileStorage(BytesIO(b'first'), 'input.txt')
+    assert inspect_upload(storage).size == 5
+    storage.stream = BytesIO(b'second')
+    assert inspect_upload(storage).size == 6
+
+
+def test_inspect_hashed_while_receiving(mocker):
+    from flask import Flask
+    from flask_uploader.inspection import HashingStream
+    from flask_uploader.wrappers import Request
+
+    app = Flask(__name__)
+    app.request_class = Request
+    data = b'y' * 1024 * 1024
+
+    with app.test_request_context(
+        method='POST',
+        data={'file': (BytesIO(data), 'input.bin')},
+    ):
+        from flask import request
+        storage = request.files['file']
+        assert isinstance(storage.stream, HashingStream)
+
+        spy = mocker.spy(storage.stream._stream, 'read')
+        info = inspect_upload(storage, 'md5')
+
+        assert info.digest == hashlib.md5(data).hexdigest()
+        assert info.size == len(data)
+        assert info.header == data[:65536]
+        assert spy.call_count == 0
@@ -0,0 +1,330 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import io
+import threading
+from types import SimpleNamespace
+
+from bson.objectid import ObjectId
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+pytest.importorskip('flask_pymongo')
+
+from mongomock.gridfs import enable_gridfs_integration  # noqa: E402
+
+from flask_uploader.contrib.pymongo import (  # noqa: E402
+    GridFSReader,
+    GridFSStorage,
+    Lookup,
+)
+from flask_uploader.exceptions import FileNotFound  # noqa: E402
+
+enable_gridfs_integration()
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().db
+
+
+@pytest.fixture
+def storage(db):
+    return GridFSStorage(SimpleNamespace(db=db), 'files')
+
+
+def insert_file(db, filename, index=None):
+    doc = {
+        'filename': filename,
+        'length': 0,
+        'chunkSize': 255 * 1024,
+        'uploadDate': datetime.utcnow(),
+        'metadata': {'contentType': 'text/plain'},
+    }
+    if index is not None:
+        doc['metadata']['index'] = index
+    return db['files.files'].insert_one(doc).inserted_id
+
+
+def test_bucket_is_cached(storage, db):
+    bucket = storage.get_bucket()
+    assert storage.get_bucket() is bucket
+
+    indexes = db['files.files'].index_information()
+    keys = [info['key'] for info in indexes.values()]
+    assert [('filename', 1), ('uploadDate', 1)] in keys
+    assert [('metadata.index', 1)] in keys
+
+
+def test_get_last_index(storage, db):
+    bucket = storage.get_bucket()
+    assert bucket.get_last_index('a_%d.txt') == 0
+
+    insert_file(db, 'a.txt')
+    insert_file(db, 'a_2.txt', 2)
+    insert_file(db, 'a_10.txt', 10)
+    insert_file(db, 'xa_20.txt', 20)
+    insert_file(db, 'a_30.txt.bak', 30)
+
+    assert bucket.get_last_index('a_%d.txt') == 10
+
+
+def test_next_index_seeded(storage, db):
+    insert_file(db, 'a_7.txt', 7)
+    bucket = storage.get_bucket()
+
+    assert bucket.next_index('a_%d.txt') == 8
+    assert bucket.next_index('a_%d.txt') == 9
+    assert bucket.next_index('b_%d.txt') == 1
+    assert storage._resolve_conflict('a.txt') == ('a_10.txt', 10)
+
+
+class AtomicCollection:
+    """
+    Serializes operations on a mongomock collection,
+    which are atomic on a real server but not in mongomock.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        def wrapper(*args, **kwargs):
+            with self._lock:
+                return method(*args, **kwargs)
+
+        return wrapper
+
+
+def test_next_index_concurrent(storage, db):
+    insert_file(db, 'a_3.txt', 3)
+    bucket = storage.get_bucket()
+    bucket.counters = AtomicCollection(bucket.counters)
+    barrier = threading.Barrier(16)
+
+    def allocate(_):
+        barrier.wait()
+        return [bucket.next_index('a_%d.txt') for _ in range(50)]
+
+    with ThreadPoolExecutor(16) as executor:
+        chunks = list(executor.map(allocate, range(16)))
+
+    indexes = [index for chunk in chunks for index in chunk]
+    assert sorted(indexes) == list(range(4, 16 * 50 + 4))
+
+
+def test_save_same_name_concurrent(storage, db, mocker):
+    from flask_uploader import Uploader
+    from flask_uploader.contrib.pymongo import Bucket
+    from werkzeug.datastructures import FileStorage
+
+    storage.filename_strategy = lambda s: 'p'
+    bucket = storage.get_bucket()
+    bucket.counters = AtomicCollection(bucket.counters)
+    barrier = threading.Barrier(4)
+    find_last_version = Bucket.find_last_version
+
+    def find_after_all(self, filename, session=None):
+        # Every upload looks for the name before any of them is written
+        found = find_last_version(self, filename, session)
+        barrier.wait()
+        return found
+
+    def upload(self, filename, source, metadata=None):
+        return insert_file(db, filename, (metadata or {}).get('index'))
+
+    mocker.patch.object(Bucket, 'find_last_version', find_after_all)
+    mocker.patch.object(Bucket, 'upload_from_stream', upload)
+    uploader = Uploader('save_same_name_concurrent', storage)
+
+    results = uploader.save_many(
+        [FileStorage(io.BytesIO(b'data'), 'p.txt') for _ in range(4)],
+        max_workers=4,
+    )
+
+    assert [r.error for r in results] == [None] * 4
+    assert sorted(d['filename'] for d in db['files.files'].find()) == [
+        'p.txt', 'p_1.txt', 'p_2.txt', 'p_3.txt',
+    ]
+
+    storage.remove('p.txt')
+    mocker.patch.object(Bucket, 'find_last_version', find_last_version)
+    lookup = storage.save(FileStorage(io.BytesIO(b'data'), 'p.txt'))
+    assert lookup.filename == 'p.txt'
+
+
+def test_lookup_round_trip():
+    oid = ObjectId()
+    lookup = Lookup.from_oid(oid, 'a/b.txt')
+
+    assert lookup == f'{oid}/a/b.txt'
+    assert lookup.filename == 'a/b.txt'
+
+    parsed = Lookup.parse(str(lookup))
+    assert parsed.oid == oid
+    assert parsed.filename == 'a/b.txt'
+
+    plain = Lookup.parse('a/b.txt')
+    assert plain.oid is None
+    assert plain.filename == 'a/b.txt'
+
+
+def test_load_by_oid(storage, mocker):
+    storage.encode_oid = True
+    oid = ObjectId()
+    grid_out = mocker.Mock(
+        _id=oid,
+        filename='a.txt',
+        length=3,
+        chunk_size=255 * 1024,
+        upload_date=datetime(2024, 1, 1),
+        metadata={'contentType': 'text/plain'},
+    )
+    bucket = storage.get_bucket()
+    open_stream = mocker.patch.object(
+        bucket, 'open_download_stream', return_value=grid_out
+    )
+    find_last = mocker.patch.object(bucket, 'find_last_version')
+
+    f = storage.load(f'{oid}/a.txt')
+
+    assert f.size == 3
+    open_stream.assert_called_once_with(oid)
+    find_last.assert_not_called()
+
+    with pytest.raises(FileNotFound):
+        storage.load(f'{oid}/b.txt')
+
+
+def test_remove_by_oid(storage, db):
+    storage.encode_oid = True
+    oid = insert_file(db, 'a.txt')
+    other = insert_file(db, 'a.txt')
+    db['files.chunks'].insert_many([
+        {'files_id': oid, 'n': 0, 'data': b'a'},
+        {'files_id': other, 'n': 0, 'data': b'b'},
+    ])
+
+    storage.remove(f'{oid}/other.txt')
+
+    assert db['files.files'].count_documents({}) == 2
+
+    storage.remove(f'{oid}/a.txt')
+
+    assert [d['_id'] for d in db['files.files'].find()] == [other]
+    assert [d['files_id'] for d in db['files.chunks'].find()] == [other]
+
+    storage.remove('a.txt')
+
+    assert db['files.files'].count_documents({}) == 0
+    assert db['files.chunks'].count_documents({}) == 0
+
+
+def test_remove_many(storage, db, mocker):
+    storage.encode_oid = True
+    oids = [insert_file(db, name) for name in ('a.txt', 'a.txt', 'b.txt')]
+    kept = insert_file(db, 'c.txt')
+    db['files.chunks'].insert_many([
+        {'files_id': oid, 'n': 0, 'data': b''} for oid in oids + [kept]
+    ])
+    delete_many = mocker.spy(type(db['files.files']), 'delete_many')
+
+    results = storage.remove_many([
+        'a.txt', f'{oids[2]}/b.txt', f'{kept}/other.txt', 'x.txt',
+    ])
+
+    assert [r.error for r in results] == [None] * 4
+    assert [d['_id'] for d in db['files.files'].find()] == [kept]
+    assert [d['files_id'] for d in db['files.chunks'].find()] == [kept]
+    assert delete_many.call_count == 2
+
+
+class FakeGridOut(io.BytesIO):
+    """Records the reads and seeks made on a file in GridFS."""
+
+    def __init__(self, data, chunk_size):
+        super().__init__(data)
+        self.chunk_size = chunk_size
+        self.length = len(data)
+        self.calls = []
+
+    def read(self, size=-1):
+        self.calls.append(('read', self.tell(), size))
+        return super().read(size)
+
+    def seek(self, offset, whence=0):
+        self.calls.append(('seek', offset))
+        return super().seek(offset, whence)
+
+
+@pytest.mark.parametrize('prefetch', [False, True])
+def test_reader(prefetch):
+    data = bytes(range(256)) * 4
+    grid_out = FakeGridOut(data, 100)
+    reader = GridFSReader(grid_out, read_chunks=2, prefetch=prefetch)
+
+    assert reader.read(10) == data[:10]
+    assert reader.read(250) == data[10:200]
+    assert reader.tell() == 200
+
+    assert reader.seek(550) == 550
+    assert reader.read() == data[550:]
+    assert reader.read(10) == b''
+
+    reader.seek(-24, io.SEEK_END)
+    assert reader.read(100) == data[-24:]
+
+    reader.close()
+    assert grid_out.closed
+
+    reads = [call for call in grid_out.calls if call[0] == 'read']
+    assert ('read', 0, 200) in reads
+    assert ('read', 550, 150) in reads
+    assert ('read', 700, 200) in reads
+    assert ('seek', 550) in grid_out.calls
+
+
+def test_load_returns_reader(storage, mocker):
+    grid_out = FakeGridOut(b'abc', 255 * 1024)
+    grid_out.filename = 'a.txt'
+    grid_out._id = ObjectId()
+    grid_out.metadata = {'contentType': 'text/plain'}
+    grid_out.upload_date = datetime(2024, 1, 1)
+    mocker.patch.object(
+        storage.get_bucket(), 'find_last_version', return_value=grid_out
+    )
+    storage.read_chunks = 8
+
+    f = storage.load('a.txt')
+
+    assert isinstance(f.path_or_file, GridFSReader)
+    assert f.path_or_file.block_size == 8 * 255 * 1024
+    assert f.path_or_file.read() == b'abc'
+
+
+def test_stat(storage, db):
+    storage.encode_oid = True
+    oid = insert_file(db, 'a.txt')
+    db['files.files'].update_one(
+        {'_id': oid}, {'$set': {'length': 3, 'metadata.digest': 'abc'}}
+    )
+
+    stat = storage.stat('a.txt')
+    assert stat.size == 3
+    assert stat.mimetype == 'text/plain'
+    assert stat.digest == 'abc'
+    assert stat.mtime.tzinfo is not None
+    assert stat.etag.startswith(str(oid))
+    assert storage.stat(f'{oid}/a.txt') == stat._replace(
+        lookup=f'{oid}/a.txt'
+    )
+
+    assert storage.exists('a.txt')
+    assert storage.exists(f'{oid}/a.txt')
+    assert not storage.exists(f'{oid}/b.txt')
+    assert not storage.exists('b.txt')
+
+    with pytest.raises(FileNotFound):
+        storage.stat('b.txt')
@@ -0,0 +1,343 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+from io import BytesIO
+from tempfile import NamedTemporaryFile
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from flask_uploader.storages import (
+    FileSystemStorage,
+    HashedFilenameStrategy,
+    TimestampStrategy,
+)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return FileSystemStorage(str(tmp_path))
+
+
+def list_dir(path):
+    return sorted(
+        os.path.relpath(os.path.join(root, f), path)
+        for root, _, files in os.walk(path)
+        for f in files
+    )
+
+
+def test_save_copy(storage):
+    data = b'content' * 1000
+    lookup = storage.save(FileStorage(BytesIO(data), 'input.txt'))
+    root_dir = storage.get_root_dir()
+
+    assert list_dir(root_dir) == [lookup]
+    with open(os.path.join(root_dir, lookup), 'rb') as f:
+        assert f.read() == data
+
+
+def test_save_link(storage, tmp_path):
+    from flask import Flask, request
+    from flask_uploader.wrappers import Request
+
+    app = Flask(__name__)
+    app.request_class = Request
+    app.config['UPLOADER_TEMP_DIR'] = str(tmp_path / 'tmp')
+    (tmp_path / 'tmp').mkdir()
+    data = b'linked content' * 100000
+
+    with app.test_request_context(
+        method='POST',
+        data={'file': (BytesIO(data), 'input.txt')},
+    ):
+        upload = request.files['file']
+        lookup = storage.save(upload)
+        path = os.path.join(storage.get_root_dir(), lookup)
+        assert os.path.samefile(path, upload.stream.name)
+
+    with open(path, 'rb') as f:
+        assert f.read() == data
+
+
+def test_save_copies_caller_files(storage, tmp_path):
+    (tmp_path / 'own').mkdir()
+    with NamedTemporaryFile('rb+', dir=tmp_path / 'own') as f:
+        f.write(b'own content')
+        f.seek(0)
+        mode = os.stat(f.name).st_mode
+        lookup = storage.save(FileStorage(f, 'input.txt'))
+        path = os.path.join(storage.get_root_dir(), lookup)
+
+        assert not os.path.samefile(path, f.name)
+        assert os.stat(f.name).st_mode == mode
+
+    with open(path, 'rb') as f:
+        assert f.read() == b'own content'
+
+
+def test_save_failure_leaves_no_file(storage, mocker):
+    mocker.patch(
+        'flask_uploader.storages.copy_stream', side_effect=OSError
+    )
+    stream = FileStorage(BytesIO(b'content'), 'input.txt')
+
+    with pytest.raises(OSError):
+        storage.save(stream)
+
+    assert list_dir(storage.get_root_dir()) == []
+
+
+def test_save_retries_from_start(storage, mocker):
+    replace = os.replace
+    calls = []
+
+    def remove_dir_once(src, dst):
+        # The directory disappears after the stream has been copied
+        if not calls:
+            calls.append(dst)
+            raise FileNotFoundError(dst)
+        return replace(src, dst)
+
+    mocker.patch('flask_uploader.storages.os.replace', remove_dir_once)
+    lookup = storage.save(
+        FileStorage(BytesIO(b'content'), 'input.txt'), overwrite=True
+    )
+
+    assert calls
+    with open(os.path.join(storage.get_root_dir(), lookup), 'rb') as f:
+        assert f.read() == b'content'
+
+
+def test_save_overwrite(tmp_path):
+    storage = FileSystemStorage(
+        str(tmp_path),
+        filename_strategy=TimestampStrategy(fmt='name'),
+        fsync=FileSystemStorage.FSYNC_FULL,
+    )
+    storage.save(FileStorage(BytesIO(b'first'), 'input.txt'))
+    lookup = storage.save(
+        FileStorage(BytesIO(b'second'), 'input.txt'), overwrite=True
+    )
+
+    assert lookup == 'name.txt'
+    assert list_dir(str(tmp_path)) == ['name.txt']
+    assert (tmp_path / 'name.txt').read_bytes() == b'second'
+
+
+def test_invalid_fsync_policy(tmp_path):
+    with pytest.raises(ValueError):
+        FileSystemStorage(str(tmp_path), fsync='always')
+
+
+def test_save_resolves_conflicts(tmp_path, mocker):
+    storage = FileSystemStorage(
+        str(tmp_path),
+        filename_strategy=TimestampStrategy(fmt='name'),
+    )
+
+    def save():
+        return storage.save(FileStorage(BytesIO(b'content'), 'input.txt'))
+
+    assert [save() for _ in range(3)] == [
+        'name.txt', 'name_1.txt', 'name_2.txt'
+    ]
+
+    spy = mocker.spy(os.path, 'exists')
+    assert save() == 'name_3.txt'
+    assert not any('name_' in str(c.args[0]) for c in spy.call_args_list)
+
+
+def test_concurrent_save_never_overwrites(tmp_path):
+    storage = FileSystemStorage(
+        str(tmp_path),
+        filename_strategy=TimestampStrategy(fmt='name'),
+    )
+
+    def save(i):
+        return storage.save(FileStorage(BytesIO(b'%d' % i), 'input.txt'))
+
+    with ThreadPoolExecutor(8) as executor:
+        lookups = list(executor.map(save, range(50)))
+
+    assert len(set(lookups)) == 50
+    assert sorted(list_dir(str(tmp_path))) == sorted(lookups)
+
+
+def test_root_dir_is_cached(tmp_path, mocker):
+    from flask import Flask
+
+    app = Flask(__name__)
+    app.config['UPLOADER_ROOT_DIR'] = str(tmp_path)
+    app.config['UPLOADER_INSTANCE_RELATIVE_ROOT'] = False
+    storage = FileSystemStorage('files')
+    spy = mocker.spy(os, 'access')
+
+    with app.app_context():
+        assert storage.get_root_dir() == str(tmp_path / 'files')
+        assert storage.get_root_dir() == str(tmp_path / 'files')
+        assert spy.call_count == 1
+
+        app.config['UPLOADER_ROOT_DIR'] = str(tmp_path / 'other')
+        (tmp_path / 'other').mkdir()
+        storage.reset_root_dir()
+        assert storage.get_root_dir() == str(tmp_path / 'other' / 'files')
+
+
+def test_iter_dirs():
+    strategy = HashedFilenameStrategy(step=1, max_split=3)
+    dirs = list(strategy.iter_dirs())
+    assert len(dirs) == 16 + 16 * 16
+    assert dirs[:2] == ['0', os.path.join('0', '0')]
+    assert list(HashedFilenameStrategy(max_split=1).iter_dirs()) == []
+
+
+def test_make_dirs(tmp_path, mocker):
+    storage = FileSystemStorage(
+        str(tmp_path),
+        filename_strategy=HashedFilenameStrategy(step=1, max_split=3),
+    )
+    assert storage.make_dirs() == 16 + 16 * 16
+    assert (tmp_path / 'f' / 'a').is_dir()
+
+    spy = mocker.spy(os, 'makedirs')
+    lookup = storage.save(FileStorage(BytesIO(b'content'), 'input.txt'))
+    assert spy.call_count == 0
+    assert (tmp_path / lookup).read_bytes() == b'content'
+
+
+def test_make_dirs_command(tmp_path):
+    from flask import Flask
+    from flask_uploader import init_uploader, Uploader
+
+    app = Flask(__name__)
+    init_uploader(app)
+    uploader = Uploader(
+        'cli_files',
+        FileSystemStorage(
+            str(tmp_path),
+            filename_strategy=HashedFilenameStrategy(step=1, max_split=2),
+        ),
+    )
+    result = app.test_cli_runner().invoke(
+        args=['uploader', 'make-dirs', uploader.name]
+    )
+    assert result.exit_code == 0
+    assert 'Directories: 16' in result.output
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in ('a.txt', 'a/b.txt', 'a/c/d.txt', 'a.txt.d/e.txt', 'b.txt'):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'')
+    (tmp_path / '.hidden.tmp').write_bytes(b'')
+    return FileSystemStorage(str(tmp_path))
+
+
+def test_list_files_pages(tree):
+    pages = []
+    cursor = None
+
+    while True:
+        page = tree.list_files(limit=2, cursor=cursor)
+        pages.append([f.lookup for f in page.files])
+        if page.cursor is None:
+            break
+        cursor = page.cursor
+
+    assert pages == [
+        [os.path.join('a', 'b.txt'), os.path.join('a', 'c', 'd.txt')],
+        ['a.txt', os.path.join('a.txt.d', 'e.txt')],
+        ['b.txt'],
+    ]
+
+
+def test_list_files_prefix(tree):
+    page = tree.list_files(prefix='a/')
+    assert [f.lookup for f in page.files] == [
+        os.path.join('a', 'b.txt'), os.path.join('a', 'c', 'd.txt'),
+    ]
+    page = tree.list_files(prefix='a.t')
+    assert [f.lookup for f in page.files] == [
+        'a.txt', os.path.join('a.txt.d', 'e.txt'),
+    ]
+    page = tree.list_files(prefix='a/', cursor='a.txt')
+    assert page.files == []
+
+
+def test_list_files_scans_once(tree, tmp_path, mocker):
+    from flask_uploader import storages
+    scan_dir = mocker.patch.object(
+        storages, '_scan_dir', wraps=storages._scan_dir
+    )
+    lookups = [f.lookup for f in storages.iter_files(tree, page_size=1)]
+    assert len(lookups) == 5
+    assert scan_dir.call_count == 4
+
+    (tmp_path / 'c.txt').write_bytes(b'')
+    lookups = [f.lookup for f in storages.iter_files(tree, page_size=1)]
+    assert lookups[-1] == 'c.txt'
+    assert scan_dir.call_count == 5
+
+
+def test_iter_files(tree):
+    from flask_uploader.storages import iter_files
+    lookups = [f.lookup for f in iter_files(tree, page_size=1)]
+    assert len(lookups) == 5
+    assert lookups[-1] == 'b.txt'
+
+
+def test_remove_many(storage, tmp_path):
+    lookups = [
+        storage.save(FileStorage(BytesIO(b'%d' % i), 'input.txt'))
+        for i in range(20)
+    ]
+    (tmp_path / 'dir').mkdir()
+
+    results = storage.remove_many(lookups + ['missing.txt', 'dir'])
+
+    assert [r.lookup for r in results] == lookups + ['missing.txt', 'dir']
+    assert all(r.error is None for r in results[:-1])
+    assert isinstance(results[-1].error, OSError)
+    assert list_dir(storage.get_root_dir()) == []
+
+
+def test_save_many(tmp_path):
+    from flask import Flask
+    from flask_uploader import init_uploader, Uploader
+    from flask_uploader.exceptions import ValidationError
+    from flask_uploader.validators import Extension
+
+    app = Flask(__name__)
+    app.config['UPLOADER_ROOT_DIR'] = str(tmp_path)
+    init_uploader(app)
+
+    def reject_empty(storage):
+        if not storage.stream.read(1):
+            raise RuntimeError('Empty file.')
+        storage.stream.seek(0)
+
+    uploader = Uploader(
+        'save_many',
+        FileSystemStorage('files'),
+        validators=[Extension(['txt']), reject_empty],
+    )
+    uploads = [
+        FileStorage(BytesIO(b'%d' % i), 'input.%s' % ext)
+        for i, ext in enumerate(['txt', 'exe', 'txt', 'txt'])
+    ]
+    uploads.append(FileStorage(BytesIO(), 'empty.txt'))
+
+    with app.app_context():
+        results = uploader.save_many(uploads, max_workers=2)
+
+        assert results[1].lookup is None
+        assert isinstance(results[1].error, ValidationError)
+        assert isinstance(results[4].error, RuntimeError)
+
+        for i in (0, 2, 3):
+            assert results[i].error is None
+            f = uploader.load(results[i].lookup)
+            with open(f.path_or_file, 'rb') as fp:
+                assert fp.read() == b'%d' % i
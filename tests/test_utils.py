@@ -0,0 +1,81 @@
+import hashlib
+from io import BytesIO
+import os
+
+import pytest
+
+from flask_uploader.utils import (
+    copy_stream,
+    hash_file,
+    hash_stream,
+    iter_chunks,
+    md5stream,
+    new_hash,
+    register_hash,
+)
+
+
+DATA = bytes(range(256)) * 1000
+
+
+@pytest.mark.parametrize('algorithm', ('md5', 'sha256', 'blake2b'))
+def test_hash_stream(algorithm):
+    stream = BytesIO(DATA)
+    expected = hashlib.new(algorithm, DATA).hexdigest()
+    assert hash_stream(stream, algorithm) == expected
+    assert stream.tell() == 0
+
+
+def test_hash_file(tmp_path):
+    path = tmp_path / 'input.bin'
+    path.write_bytes(DATA)
+    assert hash_file(str(path), 'sha256') == hashlib.sha256(DATA).hexdigest()
+    with open(path, 'rb') as f:
+        assert md5stream(f) == hashlib.md5(DATA).hexdigest()
+
+
+def test_iter_chunks_file(tmp_path):
+    path = tmp_path / 'input.bin'
+    path.write_bytes(DATA)
+    with open(path, 'rb') as f:
+        chunks = [bytes(c) for c in iter_chunks(f, buffer_size=1000)]
+    assert len(chunks) == 256
+    assert b''.join(chunks) == DATA
+
+
+def test_iter_chunks_bytes_io():
+    stream = BytesIO(DATA)
+    stream.seek(10)
+    chunks = [bytes(c) for c in iter_chunks(stream)]
+    assert chunks == [DATA[10:]]
+    stream.write(b'released')
+
+
+def test_register_hash(monkeypatch):
+    from flask_uploader import utils
+    monkeypatch.setattr(utils, '_hash_factories', dict(utils._hash_factories))
+    register_hash('Custom', lambda: hashlib.sha1())
+    assert new_hash('custom').name == 'sha1'
+
+
+def test_copy_stream_short_kernel_copy(tmp_path, mocker):
+    real = getattr(os, 'copy_file_range', None)
+    if real is None:
+        pytest.skip('os.copy_file_range is not available')
+
+    src_path = tmp_path / 'src'
+    src_path.write_bytes(DATA)
+    calls = []
+
+    def copy_file_range(src, dst, count, offset_src=None, offset_dst=None):
+        calls.append(count)
+        if len(calls) > 1:
+            return 0
+        return real(src, dst, min(count, 1000), offset_src, offset_dst)
+
+    mocker.patch('os.copy_file_range', copy_file_range)
+
+    with open(src_path, 'rb') as src, open(tmp_path / 'dst', 'wb') as dst:
+        assert copy_stream(src, dst) == len(DATA)
+
+    assert (tmp_path / 'dst').read_bytes() == DATA
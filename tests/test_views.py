@@ -0,0 +1,210 @@
+from datetime import datetime, timezone
+from io import BytesIO, BufferedReader
+
+from flask import Flask
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from flask_uploader import init_uploader, Uploader
+from flask_uploader.exceptions import FileNotFound
+from flask_uploader.storages import (
+    AbstractStorage,
+    File,
+    FileSystemStorage,
+    TimestampStrategy,
+)
+from flask_uploader.views import DownloadView
+
+
+DATA = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    init_uploader(app)
+    return app
+
+
+@pytest.fixture
+def uploader(app, tmp_path, request):
+    uploader = Uploader(request.node.name, FileSystemStorage(str(tmp_path)))
+    with app.app_context():
+        uploader.save(FileStorage(BytesIO(DATA), 'input.bin'))
+    return uploader
+
+
+def get_url(app, uploader):
+    with app.app_context():
+        lookup = uploader.storage.list_files().files[0].lookup
+    return f'/media/{uploader.name}/{lookup}'
+
+
+def test_range_request(app, uploader):
+    client = app.test_client()
+    rv = client.get(get_url(app, uploader), headers={'Range': 'bytes=10-19'})
+    assert rv.status_code == 206
+    assert rv.data == DATA[10:20]
+    assert rv.headers['Content-Range'] == f'bytes 10-19/{len(DATA)}'
+
+
+def test_conditional_request(app, uploader):
+    client = app.test_client()
+    url = get_url(app, uploader)
+    rv = client.get(url)
+    assert rv.status_code == 200
+    assert 'immutable' in rv.headers['Cache-Control']
+
+    rv = client.get(url, headers={'If-None-Match': rv.headers['ETag']})
+    assert rv.status_code == 304
+
+
+def test_stream_with_metadata(app):
+    last_modified = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    f = File(
+        path_or_file=BufferedReader(BytesIO(DATA)),
+        filename='input.bin',
+        mimetype='application/octet-stream',
+        size=len(DATA),
+        last_modified=last_modified,
+        etag='abc',
+    )
+
+    with app.test_request_context(headers={'Range': 'bytes=-16'}):
+        rv = DownloadView().send_file(f)
+        assert rv.status_code == 206
+        assert b''.join(rv.response) == DATA[-16:]
+        assert rv.headers['ETag'] == '"abc"'
+        assert 'immutable' not in rv.headers.get('Cache-Control', '')
+
+    with app.test_request_context(
+        headers={'If-Modified-Since': 'Sun, 01 Jan 2023 00:00:00 GMT'}
+    ):
+        assert DownloadView().send_file(f).status_code == 304
+
+
+def test_mutable_files(app, tmp_path):
+    uploader = Uploader(
+        'mutable_files',
+        FileSystemStorage(
+            str(tmp_path), filename_strategy=TimestampStrategy(fmt='name')
+        ),
+    )
+    with app.app_context():
+        uploader.save(FileStorage(BytesIO(DATA), 'input.bin'))
+
+    rv = app.test_client().get('/media/mutable_files/name.bin')
+    assert rv.status_code == 200
+    assert 'immutable' not in rv.headers.get('Cache-Control', '')
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('X-Accel-Redirect', '/protected/{lookup}'),
+    ('X-Sendfile', '{root}/{lookup}'),
+])
+def test_offload(app, tmp_path, header, expected):
+    storage = FileSystemStorage(
+        str(tmp_path),
+        offload_header=header,
+        offload_prefix='/protected/',
+    )
+    uploader = Uploader('offload_' + header, storage)
+
+    with app.app_context():
+        lookup = uploader.save(FileStorage(BytesIO(DATA), 'input.bin'))
+
+    client = app.test_client()
+    rv = client.get(f'/media/{uploader.name}/{lookup}')
+    assert rv.status_code == 200
+    assert rv.data == b''
+    assert rv.headers[header] == expected.format(
+        root=tmp_path.as_posix(), lookup=lookup
+    )
+    assert rv.headers['Content-Disposition'] == (
+        'attachment; filename=' + lookup.rsplit('/', 1)[-1]
+    )
+
+    rv = client.get(f'/media/{uploader.name}/missing.bin')
+    assert rv.status_code == 404
+
+
+def test_head_request(app, uploader, mocker):
+    client = app.test_client()
+    url = get_url(app, uploader)
+    get = client.get(url)
+    load = mocker.spy(FileSystemStorage, 'load')
+
+    rv = client.head(url)
+    assert rv.status_code == 200
+    assert rv.data == b''
+    assert rv.content_length == len(DATA)
+    for header in ('ETag', 'Last-Modified', 'Cache-Control'):
+        assert rv.headers[header] == get.headers[header]
+
+    rv = client.get(url, headers={'If-None-Match': get.headers['ETag']})
+    assert rv.status_code == 304
+
+    load.assert_not_called()
+
+    rv = client.head(f'/media/{uploader.name}/missing.bin')
+    assert rv.status_code == 404
+
+
+def test_head_without_metadata(app, tmp_path):
+    class Storage(FileSystemStorage):
+        def stat(self, lookup):
+            raise FileNotFound(lookup)
+
+    uploader = Uploader('head_without_metadata', Storage(str(tmp_path)))
+
+    with app.app_context():
+        lookup = uploader.save(FileStorage(BytesIO(DATA), 'input.bin'))
+
+    rv = app.test_client().head(f'/media/{uploader.name}/{lookup}')
+    assert rv.status_code == 200
+    assert rv.content_length == len(DATA)
+
+
+def test_unindexed_file(app, tmp_path):
+    uploader = Uploader('unindexed_file', FileSystemStorage(
+        str(tmp_path), index_path='.index.sqlite3',
+    ))
+    (tmp_path / 'copied.bin').write_bytes(DATA)
+    client = app.test_client()
+
+    rv = client.head(f'/media/{uploader.name}/copied.bin')
+    assert rv.status_code == 200
+    assert rv.content_length == len(DATA)
+
+    rv = client.get(
+        f'/media/{uploader.name}/copied.bin',
+        headers={'If-None-Match': rv.headers['ETag']},
+    )
+    assert rv.status_code == 304
+
+    with app.app_context():
+        assert uploader.exists('copied.bin')
+
+
+def test_exists_and_stat(app, uploader):
+    with app.app_context():
+        lookup = uploader.storage.list_files().files[0].lookup
+        assert uploader.exists(lookup)
+        assert not uploader.exists('missing.bin')
+
+        stat = uploader.stat(lookup)
+        assert stat.size == len(DATA)
+        assert stat.etag == uploader.load(lookup).etag
+
+
+def test_exists_without_stat(app, tmp_path):
+    class Storage(FileSystemStorage):
+        exists = AbstractStorage.exists
+        stat = AbstractStorage.stat
+
+    uploader = Uploader('exists_without_stat', Storage(str(tmp_path)))
+
+    with app.app_context():
+        lookup = uploader.save(FileStorage(BytesIO(DATA), 'input.bin'))
+        assert uploader.exists(lookup)
+        assert not uploader.exists('missing.bin')